@@ -0,0 +1,56 @@
+"""Checks the container header readers of exo_to_aup2.py on small generated files.
+
+Each file is written with the header builders of make_exo_corpus.py, some of them corrupt,
+and read with read_container_fps, which must return the expected frame rate (None when the
+header can't be read) and never raise. Exits with status 1 when a check fails.
+
+    python benchmark/check_media_headers.py
+"""
+import os
+import sys
+import math
+import tempfile
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..'))
+import exo_to_aup2
+from make_exo_corpus import avi_header, mp4_header, matroska_header
+
+CASES = [
+    ("AVI 24 fps", avi_header(24, 1), 24.0),
+    ("AVI 29.97 fps", avi_header(30000, 1001), 30000 / 1001),
+    ("MP4 29.97 fps", mp4_header(30000, 1001), 30000 / 1001),
+    ("MP4 60 fps", mp4_header(60000, 1000), 60.0),
+    ("Matroska 25 fps", matroska_header(40000000), 25.0),
+    ("Matroska 23.976 fps", matroska_header(41708333), 24000 / 1001),
+    # 壊れたヘッダー: 数や大きさはファイルに収まる分までしか読まない
+    ("MP4 claiming 0xFFFFFFFF stts entries", mp4_header(30000, 1001, entry_count=0xFFFFFFFF), 30000 / 1001),
+    ("MP4 cut inside moov", mp4_header(30000, 1001)[:60], None),
+    ("Matroska DefaultDuration of 2^48 bytes", matroska_header(40000000, duration_size=2**48), 25.0),
+    ("Matroska cut inside Tracks", matroska_header(40000000)[:40], None),
+    ("not a media file", b'not a media file', None),
+]
+
+def check_case(work_dir, num, data, expected):
+    """Returns None if the file reads as expected, else what went wrong."""
+    path = os.path.join(work_dir, f'case{num}')
+    with open(path, 'wb') as f:
+        f.write(data)
+    try:
+        fps = exo_to_aup2.read_container_fps(path)
+    except Exception as e:
+        return f"raised {type(e).__name__}: {e}"
+    if expected is None:
+        return None if fps is None else f"read {fps} fps from an unreadable header"
+    if fps is None or not math.isclose(fps, expected, rel_tol=1e-6):
+        return f"read {fps} fps instead of {expected}"
+    return None
+
+if __name__ == '__main__':
+    failures = 0
+    with tempfile.TemporaryDirectory(prefix='exo_media_') as work_dir:
+        for num, (name, data, expected) in enumerate(CASES):
+            problem = check_case(work_dir, num, data, expected)
+            print(f"{'ok' if problem is None else 'FAILED'}: {name}" + (f": {problem}" if problem else ""))
+            failures += problem is not None
+    sys.exit(1 if failures else 0)
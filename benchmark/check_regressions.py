@@ -0,0 +1,284 @@
+"""Checks exo_to_aup2.py for output, memory and throughput regressions on synthetic projects.
+
+For every scale a corpus is generated with make_exo_corpus.py (same seed as run_benchmark.py)
+and converted as the command line does. The run fails (exit status 1) when:
+
+    output      the .aup2 differs from the digest pinned in output_digests.json, from the
+                output recorded in the baseline, or from the one written by the converter
+                given with --reference (a git revision or a file), or none of them applies
+                to the corpus and scale, so the output could not be checked
+    memory      the peak memory traced by tracemalloc grows faster than the object count from
+                one scale to the next, or exceeds the recorded peak of that scale
+    throughput  objects per second fall below the recorded baseline of that scale
+
+output_digests.json pins the output of the default corpus, and of a corpus the original
+converter (the first revision, 2bf7c11) can convert as well: no group or camera control
+objects and no media files, whose FPS it read differently. The original slows down with the
+square of the object count, so that corpus is pinned up to 10000 objects. Check it against
+the original with
+
+    python benchmark/check_regressions.py --reference 2bf7c11 --scales 1000,10000 --media 0 \\
+        --effect-mix テキスト:1,画像ファイル:1,動画ファイル:1,図形:1,音声ファイル:1,シーン:1
+
+After an intended change of the output, pin the new output with --record-digests. Baselines
+depend on the machine, so record them once where the check runs, with --record, and again
+after an intended change:
+
+    python benchmark/check_regressions.py --record benchmark/baselines.json
+    python benchmark/check_regressions.py --baseline benchmark/baselines.json
+"""
+import os
+import sys
+import io
+import json
+import time
+import filecmp
+import hashlib
+import platform
+import argparse
+import tempfile
+import contextlib
+import subprocess
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..'))
+import exo_to_aup2
+from make_exo_corpus import generate, add_corpus_arguments
+from run_benchmark import clear_caches, git_revision
+
+OUTPUT_NAME = 'output.aup2'
+REFERENCE_NAME = 'reference.aup2'
+DIGESTS_PATH = os.path.join(BENCHMARK_DIR, 'output_digests.json')
+
+def reference_script(reference, work_dir):
+    """Returns the path of the reference exo_to_aup2.py: reference itself if it is a file, or
+    else the file at that git revision, written to work_dir.
+    """
+    if os.path.isfile(reference):
+        return os.path.abspath(reference)
+    source = subprocess.run(['git', 'show', f'{reference}:exo_to_aup2.py'], cwd=BENCHMARK_DIR, capture_output=True,
+                            check=True).stdout
+    path = os.path.join(work_dir, 'reference_exo_to_aup2.py')
+    with open(path, 'wb') as f:
+        f.write(source)
+    return path
+
+def output_digest(output_path, corpus_dir):
+    """SHA-256 of the .aup2, with the corpus directory in the media paths replaced, so that
+    the digest does not depend on where the corpus was generated.
+    """
+    with open(output_path, 'rb') as f:
+        data = f.read()
+    return hashlib.sha256(data.replace(corpus_dir.encode('utf-8'), b'<corpus>')).hexdigest()
+
+def load_digests(path, corpus):
+    """Returns {objects: output_sha256} pinned in the digest file for these corpus options."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            pinned = json.load(f)
+    except FileNotFoundError:
+        return {}
+    for entry in pinned["corpora"]:
+        if entry["corpus"] == corpus:
+            return {int(objects): digest for objects, digest in entry["output_sha256"].items()}
+    return {}
+
+def record_digests(path, corpus, results):
+    """Pins the output digests of results in the digest file, replacing those of the same corpus and scale."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            pinned = json.load(f)
+    except FileNotFoundError:
+        pinned = {"corpora": []}
+    entry = next((entry for entry in pinned["corpora"] if entry["corpus"] == corpus), None)
+    if entry is None:
+        entry = {"corpus": corpus, "output_sha256": {}}
+        pinned["corpora"].append(entry)
+    for result in results:
+        entry["output_sha256"][str(result["objects"])] = result["output_sha256"]
+    entry["revision"] = git_revision()
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(pinned, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+def convert_once(exo_paths):
+    """Converts the corpus in the current directory to OUTPUT_NAME as the command line does."""
+    clear_caches()
+    anim_names, media_paths = exo_to_aup2.scan_exo_references(exo_paths)
+    maps = exo_to_aup2.load_maps(anim_names=anim_names)
+    video_fps = exo_to_aup2.probe_all_media_fps(media_paths)
+    exo_to_aup2.convert_project(exo_paths, OUTPUT_NAME, maps["effect_map"], maps["anim_map"], video_fps,
+                                converters=maps["converters"])
+
+def run_scale(work_dir, objects, options, script):
+    """Generates a corpus of the given size, converts it and returns its result entry."""
+    corpus_dir = os.path.join(work_dir, f"objects_{objects}")
+    options.objects = objects
+    exo_paths = [os.path.basename(path) for path in generate(corpus_dir, options)]
+    cwd = os.getcwd()
+    os.chdir(corpus_dir)  # 変換は Script/ と AviUtl2_doc/ を作業ディレクトリから読む
+    try:
+        if script:
+            # 出力には出力ファイル名が入るので、同じ名前で書いてから移す
+            subprocess.run([sys.executable, script] + exo_paths + [OUTPUT_NAME], stdout=subprocess.DEVNULL,
+                           check=True)
+            os.replace(OUTPUT_NAME, REFERENCE_NAME)
+
+        seconds = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(options.repeat):
+                started = time.perf_counter()
+                convert_once(exo_paths)
+                seconds.append(time.perf_counter() - started)
+
+            # 計測が遅くなるので時間とは別に変換する
+            tracemalloc.start()
+            try:
+                convert_once(exo_paths)
+                _, peak_bytes = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+        output_sha256 = output_digest(OUTPUT_NAME, corpus_dir)
+        identical = filecmp.cmp(OUTPUT_NAME, REFERENCE_NAME, shallow=False) if script else None
+    finally:
+        os.chdir(cwd)
+    return {
+        "objects": objects,
+        "seconds": min(seconds),
+        "objects_per_second": objects / min(seconds),
+        "peak_bytes": peak_bytes,
+        "output_sha256": output_sha256,
+        "identical": identical,
+    }
+
+def check_outputs(results, baseline, digests):
+    """Sets "output" of every entry to whether it matches the reference conversion, the pinned
+    digest and the recorded output, or None when there is nothing to compare it with.
+    """
+    baseline_by_scale = {entry["objects"]: entry for entry in (baseline or {}).get("results", [])}
+    for entry in results:
+        checks = []
+        if entry["identical"] is not None:
+            checks.append(entry["identical"])
+        for recorded in (digests.get(entry["objects"]), baseline_by_scale.get(entry["objects"], {}).get("output_sha256")):
+            if recorded:
+                checks.append(entry["output_sha256"] == recorded)
+        entry["output"] = all(checks) if checks else None
+
+def check_results(results, baseline, options):
+    """Returns the failures of the results as messages."""
+    failures = []
+    for entry in results:
+        if entry["output"] is False:
+            failures.append(f"{entry['objects']} objects: output differs from the pinned, recorded or reference output")
+        elif entry["output"] is None and not options.record_digests:
+            failures.append(f"{entry['objects']} objects: output was not checked; no digest is pinned for this corpus "
+                            f"and scale, give --reference or a --baseline recorded with its output")
+
+    # 固定の分があるので、メモリは規模に比例するより遅く増えるのが普通
+    for smaller, larger in zip(results, results[1:]):
+        allowed = smaller["peak_bytes"] * larger["objects"] / smaller["objects"] * (1 + options.linear_slack)
+        if larger["peak_bytes"] > allowed:
+            failures.append(f"{larger['objects']} objects: peak memory {larger['peak_bytes'] / 2**20:.1f} MiB grows "
+                            f"faster than linearly from {smaller['objects']} objects ({smaller['peak_bytes'] / 2**20:.1f} MiB)")
+
+    baseline_by_scale = {entry["objects"]: entry for entry in (baseline or {}).get("results", [])}
+    for entry in results:
+        old = baseline_by_scale.get(entry["objects"])
+        if not old:
+            continue
+        budget = old["peak_bytes"] * (1 + options.memory_tolerance)
+        if entry["peak_bytes"] > budget:
+            failures.append(f"{entry['objects']} objects: peak memory {entry['peak_bytes'] / 2**20:.1f} MiB is over "
+                            f"the budget of {budget / 2**20:.1f} MiB")
+        minimum = old["objects_per_second"] * (1 - options.throughput_tolerance)
+        if entry["objects_per_second"] < minimum:
+            failures.append(f"{entry['objects']} objects: {entry['objects_per_second']:.0f} objects/s is below "
+                            f"{minimum:.0f} objects/s")
+    return failures
+
+def print_results(results, baseline=None):
+    baseline_by_scale = {entry["objects"]: entry for entry in (baseline or {}).get("results", [])}
+    print(f"{'objects':<9}{'objects/s':>20}{'peak MiB':>20}{'bytes/object':>14}  output")
+    for entry in results:
+        old = baseline_by_scale.get(entry["objects"])
+        speed = f"{entry['objects_per_second']:.0f}"
+        peak = f"{entry['peak_bytes'] / 2**20:.1f}"
+        if old:
+            speed += f" x{entry['objects_per_second'] / old['objects_per_second']:.2f}"
+            peak += f" x{entry['peak_bytes'] / old['peak_bytes']:.2f}"
+        output = {True: "identical", False: "DIFFERS", None: "not checked"}[entry["output"]]
+        print(f"{entry['objects']:<9}{speed:>20}{peak:>20}{entry['peak_bytes'] // entry['objects']:>14}  {output}")
+    if baseline:
+        print(f"(xN: relative to the baseline of {baseline.get('revision')}, {baseline.get('date')})")
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Check exo_to_aup2.py for output, memory and throughput regressions")
+    arg_parser.add_argument("--scales", default="1000,10000,100000", help="comma separated object counts (default: 1000,10000,100000)")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="timed runs per scale; the best time is kept (default: 3)")
+    arg_parser.add_argument("--reference", help="git revision or file of a converter whose output must be matched as well")
+    arg_parser.add_argument("--baseline", metavar="JSON", help="check memory and throughput against an earlier --record file")
+    arg_parser.add_argument("--record", metavar="JSON", help="write the results as a baseline to this file")
+    arg_parser.add_argument("--digests", metavar="JSON", default=DIGESTS_PATH,
+                            help="pinned output digests (default: benchmark/output_digests.json)")
+    arg_parser.add_argument("--record-digests", action="store_true",
+                            help="pin the output of this run in --digests, after an intended change of the output")
+    arg_parser.add_argument("--throughput-tolerance", type=float, default=0.2, help="allowed drop in objects/s (default: 0.2)")
+    arg_parser.add_argument("--memory-tolerance", type=float, default=0.1, help="allowed growth of the peak memory (default: 0.1)")
+    arg_parser.add_argument("--linear-slack", type=float, default=0.1, help="allowed excess over linear memory growth (default: 0.1)")
+    arg_parser.add_argument("--work-dir", help="where to generate the corpora (default: a temporary directory)")
+    add_corpus_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    corpus = {key: value for key, value in vars(args).items()
+              if key not in ('scales', 'repeat', 'reference', 'baseline', 'record', 'digests', 'record_digests',
+                             'throughput_tolerance', 'memory_tolerance', 'linear_slack', 'work_dir', 'objects')}
+    # 記録し直すときは以前の値とは比べない
+    digests = {} if args.record_digests else load_digests(args.digests, corpus)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("corpus") != corpus:
+            print("Warning: the baseline was recorded with other corpus options; its numbers may not compare.")
+
+    with contextlib.ExitStack() as stack:
+        work_dir = os.path.abspath(args.work_dir or stack.enter_context(tempfile.TemporaryDirectory(prefix='exo_check_')))
+        os.makedirs(work_dir, exist_ok=True)
+        script = None
+        if args.reference:
+            try:
+                script = reference_script(args.reference, work_dir)
+            except (OSError, subprocess.CalledProcessError):
+                print(f"Error: cannot find the reference converter {args.reference}.", file=sys.stderr)
+                sys.exit(2)
+        results = []
+        for objects in sorted(int(scale) for scale in args.scales.split(',')):
+            print(f"Checking {objects} objects...", file=sys.stderr)
+            results.append(run_scale(work_dir, objects, args, script))
+
+    check_outputs(results, baseline, digests)
+    print_results(results, baseline)
+    if args.record_digests:
+        record_digests(args.digests, corpus, results)
+    if args.record:
+        report = {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "corpus": corpus,
+            "results": [{key: value for key, value in entry.items() if key not in ("identical", "output")}
+                        for entry in results],
+        }
+        with open(args.record, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    failures = check_results(results, baseline, args)
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    if not failures:
+        print("All checks passed.")
+    sys.exit(1 if failures else 0)
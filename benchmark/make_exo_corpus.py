@@ -0,0 +1,352 @@
+"""Generates a synthetic .exo project for benchmarking exo_to_aup2.py.
+
+Writes Root.exo and Scene<N>.exo in Shift_JIS together with matching Script/ and
+AviUtl2_doc/effect.conf fixtures and small header-only media files (AVI, MP4, Matroska, WAV),
+so the converter runs on it without OpenCV or any real footage.
+
+    python benchmark/make_exo_corpus.py out_dir --objects 10000 --scenes 3
+"""
+import os
+import sys
+import random
+import struct
+import wave
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from exo_to_aup2 import PARAM_MAP, VALUE_MAP
+
+# 標準描画 / 標準再生 は最後のフィルタとして付けるのでオブジェクトの種類からは外す
+OBJECT_TYPES = [name for name in PARAM_MAP if name != '標準描画']
+
+# PARAM_MAP にはないが exo には必ずあるパラメータ
+EXTRA_PARAMS = {
+    '動画ファイル': ['再生位置'],
+    '音声ファイル': ['再生位置'],
+}
+
+# effect.conf に載せるフィルタ効果: {exo のパラメータ名: aup2 のパラメータ名}
+FILTER_PARAMS = {
+    'ぼかし': {'範囲': 'ぼかし量', '縦横比': '縦横比', '光の強さ': '光の強さ', 'サイズ固定': 'サイズ固定'},
+    'ドロップシャドウ': {'X': 'X', 'Y': 'Y', '濃さ': '濃さ', '拡散': '拡散'},
+    '色調補正': {'明るさ': '明るさ', 'ｺﾝﾄﾗｽﾄ': 'コントラスト', '色相': '色相', '輝度': '輝度', '彩度': '彩度'},
+    'グロー': {'強さ': '強さ', '拡散': '拡散', 'しきい値': 'しきい値', 'ぼかし': 'ぼかし'},
+    '縁取り': {'サイズ': 'サイズ', 'ぼかし': 'ぼかし', 'color': '縁色'},
+    'マスク': {'X': 'X', 'Y': 'Y', '回転': '回転', 'サイズ': 'サイズ', '縦横比': '縦横比', 'ぼかし': 'ぼかし'},
+}
+
+# exo ではシャドーという名前で出てくる (EFFECT_RENAME_MAP)
+FILTER_EXO_NAMES = {'ドロップシャドウ': 'シャドー'}
+
+TRACK_MODES = [
+    '1',
+    '2',
+    '15@イージング（通常）@イージング,14',
+    '1@Type1@Curve Editor,-1520000000',
+    '3@Type1@Curve Editor,20000000',
+]
+
+TEXT_SAMPLE = "こんにちは〜世界。変換のベンチマーク用のテキストです。"
+
+SCENE_LAYOUTS = ('flat', 'chain', 'tree')
+
+def hex_text(rng, length):
+    """Hex-encodes UTF-16LE text of length characters, NUL padded to 4096 digits like AviUtl."""
+    text = "".join(rng.choice(TEXT_SAMPLE) for _ in range(length))
+    encoded = text.encode('utf-16-le').hex()
+    return encoded + '0' * max(0, 4096 - len(encoded))
+
+def track_value(rng, animated, low=-100.0, high=100.0):
+    start = round(rng.uniform(low, high), 1)
+    if not animated:
+        return f"{start}"
+    end = round(rng.uniform(low, high), 1)
+    return f"{start},{end},{rng.choice(TRACK_MODES)}"
+
+def next_track_value(rng, value):
+    """The value of a track in the next segment of a 中間点 chain: a moving track starts where
+    the previous segment ended. Other values stay as they are.
+    """
+    parts = value.split(',', 2)
+    if len(parts) < 3:
+        return value
+    try:
+        end = float(parts[1])
+    except ValueError:
+        return value
+    return f"{parts[1]},{round(end + rng.uniform(-20.0, 20.0), 1)},{parts[2]}"
+
+def next_segment_lines(rng, lines):
+    """Continues the tracks of "param=value" lines into the next segment of a chain."""
+    return [f"{param}={next_track_value(rng, value)}" for param, _, value in (line.partition('=') for line in lines)]
+
+def param_value(rng, options, effect_name, param, new_param, context):
+    """Makes up a plausible value of one parameter of PARAM_MAP."""
+    if new_param in VALUE_MAP:
+        return rng.choice(list(VALUE_MAP[new_param]))
+    if param == 'text':
+        return hex_text(rng, options.text_length)
+    if param == 'file':
+        return rng.choice(context["media"] if effect_name != '画像ファイル' else context["images"])
+    if param in ('color', 'color2'):
+        return f"{rng.randrange(0x1000000):06x}"
+    if param == 'font':
+        return 'MS UI Gothic'
+    if param == 'scene':
+        return str(rng.choice(context["child_scenes"]))
+    if param in ('range', '目標レイヤー'):
+        return str(rng.randint(1, 10))
+    if param in ('B', 'I', 'autoadjust', '移動座標上に表示する', 'ループ再生', '角を丸くする', 'オプション'):
+        return str(rng.randint(0, 1))
+    if param == '再生位置':
+        return str(rng.randint(1, 300))
+    if param == '再生速度':
+        return rng.choice(['100.0', '50.0', '200.0'])  # 変換では動かない値として読まれる
+    return track_value(rng, rng.random() < options.animated_ratio)
+
+def object_type_weights(effect_mix):
+    """Parses --effect-mix ("テキスト:3,図形:1") into (types, weights)."""
+    if not effect_mix:
+        return OBJECT_TYPES, [1] * len(OBJECT_TYPES)
+    types = []
+    weights = []
+    for item in effect_mix.split(','):
+        name, _, weight = item.partition(':')
+        if name not in OBJECT_TYPES:
+            raise ValueError(f"Unknown object type '{name}' in --effect-mix (choose from {', '.join(OBJECT_TYPES)})")
+        types.append(name)
+        weights.append(float(weight or 1))
+    return types, weights
+
+def filter_lines(rng, options, context, anim_names):
+    """Makes the lines of one filter section body (without the [N.m] line)."""
+    kind = rng.choice(['anim', 'anim', 'conf', 'conf', 'conf', 'script', 'unknown'])
+    if kind == 'anim':
+        lines = ["_name=アニメーション効果"]
+        lines += [f"track{n}={track_value(rng, rng.random() < options.animated_ratio, 0, 100)}" for n in range(4)]
+        lines += ["check0=0", "type=0", "filter=2", f"name={rng.choice(anim_names)}", "param="]
+        return lines
+    if kind == 'script':
+        return ["_name=スクリプト制御", "text=" + hex_text(rng, options.text_length)]
+    if kind == 'unknown':
+        return ["_name=未対応の効果", "強さ=10"]
+    effect_name = rng.choice(list(FILTER_PARAMS))
+    lines = [f"_name={FILTER_EXO_NAMES.get(effect_name, effect_name)}"]
+    for param in FILTER_PARAMS[effect_name]:
+        if param == 'color':
+            lines.append(f"color={rng.randrange(0x1000000):06x}")
+        else:
+            lines.append(f"{param}={track_value(rng, rng.random() < options.animated_ratio, 0, 100)}")
+    return lines
+
+def scene_lines(rng, options, object_count, context, anim_names):
+    """Makes the lines of one scene .exo."""
+    types, weights = object_type_weights(options.effect_mix)
+    lines = [
+        "[exedit]", "width=1920", "height=1080", "rate=30", "scale=1",
+        f"length={object_count * 30 + 1}", "audio_rate=48000", "audio_ch=2",
+    ]
+    layer_frames = [1] * (options.layers + 1)
+    index = 0
+    while index < object_count:
+        object_type = rng.choices(types, weights)[0]
+        if object_type == 'シーン' and not context["child_scenes"]:
+            object_type = '図形'
+        segments = 1
+        if rng.random() < options.chain_ratio:
+            segments = min(options.chain_length, object_count - index)
+        layer = rng.randint(1, options.layers)
+        filter_count = rng.randint(0, options.filters_per_object)
+        filters = [filter_lines(rng, options, context, anim_names) for _ in range(filter_count)]
+        params = {param: param_value(rng, options, object_type, param, param, context)
+                  for param in EXTRA_PARAMS.get(object_type, [])}
+        params.update((param, param_value(rng, options, object_type, param, new_param, context))
+                      for param, new_param in PARAM_MAP[object_type].items())
+        animated = segments > 1 or rng.random() < options.animated_ratio
+        draw = [f"X={track_value(rng, animated)}", f"Y={track_value(rng, animated)}", "Z=0.0",
+                "拡大率=100.00", "透明度=0.0", "回転=0.00", f"blend={rng.randint(0, 12)}"]
+        length = 0
+        for segment in range(segments):
+            if segment:
+                # 中間点のあとの区間は、動くトラックが前の区間の終わりから始まる
+                params = {param: next_track_value(rng, value) for param, value in params.items()}
+                if '再生位置' in params:
+                    speed = float(params.get('再生速度', '100.0')) / 100
+                    params['再生位置'] = str(int(params['再生位置']) + round(length * speed))
+                filters = [next_segment_lines(rng, filter_body) for filter_body in filters]
+                draw = next_segment_lines(rng, draw)
+            length = rng.randint(10, 60)
+            start = layer_frames[layer]
+            layer_frames[layer] = start + length
+            lines += [f"[{index}]", f"start={start}", f"end={start + length - 1}", f"layer={layer}"]
+            if segment:
+                lines.append("chain=1")
+            lines += ["overlay=1", "camera=0"]
+            lines += [f"[{index}.0]", f"_name={object_type}"]
+            lines += [f"{param}={value}" for param, value in params.items()]
+            for m, filter_body in enumerate(filters, 1):
+                lines += [f"[{index}.{m}]"] + filter_body
+            if object_type == '音声ファイル':
+                lines += [f"[{index}.{len(filters) + 1}]", "_name=標準再生", "音量=100.0", "左右=0.0"]
+            elif object_type not in ('グループ制御', 'カメラ制御'):
+                lines += [f"[{index}.{len(filters) + 1}]", "_name=標準描画"] + draw
+            index += 1
+    return lines
+
+def child_scenes(layout, scene_num, scene_count):
+    """The scene numbers a scene refers to in the given layout."""
+    if layout == 'flat':
+        return list(range(1, scene_count)) if scene_num == 0 else []
+    if layout == 'chain':
+        return [scene_num + 1] if scene_num + 1 < scene_count else []
+    # tree: 各シーンが2つの子シーンを持つ
+    return [child for child in (scene_num * 2 + 1, scene_num * 2 + 2) if child < scene_count]
+
+def write_scripts(out_dir, script_count, rng):
+    """Writes Script/*.anm(2) and returns the animation effect names they define."""
+    script_dir = os.path.join(out_dir, 'Script')
+    os.makedirs(script_dir, exist_ok=True)
+    names = ['震える', '点滅', '回転']
+    with open(os.path.join(script_dir, 'basic.anm'), 'w', encoding='shift_jis', newline='\r\n') as f:
+        f.write("@震える\n--track0:振幅,0,100,10\n--track1:角度,0,360,10\n--check0:ランダム,0\nobj.ox=1\n")
+        f.write("@点滅\n--track0:間隔,0,100,10\n--track1:速さ,0,100,10\n")
+        f.write("@回転\n--track0:速度,0,100,5\n--track@spd:倍率,0,10,1\n")
+    for k in range(script_count):
+        extension = '.anm2' if k % 4 == 3 else '.anm'
+        encoding = 'utf-8' if extension == '.anm2' else 'shift_jis'
+        with open(os.path.join(script_dir, f'effects{k}{extension}'), 'w', encoding=encoding, newline='\r\n') as f:
+            for e in range(rng.randint(1, 5)):
+                name = f"効果{k}_{e}"
+                names.append(name)
+                f.write(f"@{name}\n")
+                for t in range(rng.randint(1, 4)):
+                    f.write(f"--track{t}:値{t},0,100,{rng.randint(0, 100)}\n")
+                f.write("--check0:有効,0\nobj.ox = obj.track0\n")
+    return names
+
+def write_effect_conf(out_dir):
+    os.makedirs(os.path.join(out_dir, 'AviUtl2_doc'), exist_ok=True)
+    with open(os.path.join(out_dir, 'AviUtl2_doc', 'effect.conf'), 'w', encoding='utf-8') as f:
+        for effect_name, params in FILTER_PARAMS.items():
+            f.write(f"[OldScript.{effect_name}]\n")
+            for param, new_param in params.items():
+                f.write(f"{param}={new_param}\n")
+        # parse_effect_conf はこの節の後の行をすべてこの節のものとして読むので、最後に書く
+        f.write("[OldScript.アニメーション効果]\ntrack0=値0\ntrack1=値1\n")
+
+def avi_header(rate, scale):
+    """A header-only AVI whose video stream runs at rate/scale frames per second."""
+    strh = struct.pack('<4s4sIHHIII', b'vids', b'MJPG', 0, 0, 0, 0, scale, rate) + b'\0' * 24
+    avih = struct.pack('<I', round(1000000 * scale / rate)) + b'\0' * 52
+    strl = b'LIST' + struct.pack('<I', 4 + 8 + len(strh)) + b'strl' + b'strh' + struct.pack('<I', len(strh)) + strh
+    hdrl_body = b'hdrl' + b'avih' + struct.pack('<I', len(avih)) + avih + strl
+    body = b'AVI ' + b'LIST' + struct.pack('<I', len(hdrl_body)) + hdrl_body + b'LIST' + struct.pack('<I', 4) + b'movi'
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+def mp4_box(box_type, payload):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+def mp4_header(timescale, sample_delta, sample_count=100, entry_count=1):
+    """An MP4 with only a moov box, whose video track has sample_count samples of sample_delta.
+
+    entry_count is the number of stts entries the header claims; only one is written.
+    """
+    mdhd = mp4_box(b'mdhd', b'\0' * 12 + struct.pack('>II', timescale, sample_count * sample_delta) + b'\0' * 4)
+    hdlr = mp4_box(b'hdlr', b'\0' * 8 + b'vide' + b'\0' * 12)
+    stts = mp4_box(b'stts', struct.pack('>IIII', 0, entry_count, sample_count, sample_delta))
+    minf = mp4_box(b'minf', mp4_box(b'stbl', stts))
+    trak = mp4_box(b'trak', mp4_box(b'mdia', mdhd + hdlr + minf))
+    return mp4_box(b'ftyp', b'isom\0\0\0\0isom') + mp4_box(b'moov', trak)
+
+def ebml_element(element_id, data, size=None):
+    """An EBML element; size overrides the data size written in its header."""
+    size = len(data) if size is None else size
+    return element_id + b'\x01' + size.to_bytes(7, 'big') + data
+
+def matroska_header(default_duration, duration_size=None):
+    """A Matroska file with one video track of default_duration nanoseconds per frame, and no clusters."""
+    track_entry = ebml_element(b'\x83', b'\x01') + ebml_element(b'\x23\xe3\x83', default_duration.to_bytes(4, 'big'),
+                                                                duration_size)
+    tracks = ebml_element(b'\x16\x54\xae\x6b', ebml_element(b'\xae', track_entry))
+    header = ebml_element(b'\x1a\x45\xdf\xa3', ebml_element(b'\x42\x82', b'matroska'))
+    return header + ebml_element(b'\x18\x53\x80\x67', tracks)
+
+# write_media が順に書く動画・音声ファイル: (拡張子, 1周目の中身, 2周目以降の中身)
+MEDIA_KINDS = [
+    ('avi', avi_header(24, 1), avi_header(30000, 1001)),
+    ('wav', None, None),
+    ('mp4', mp4_header(30000, 1001), mp4_header(60000, 1000)),
+    ('mkv', matroska_header(40000000), matroska_header(41708333)),
+]
+
+def write_media(out_dir, count):
+    """Writes header-only AVI, MP4 and Matroska files and short WAV files, whose FPS is read without OpenCV."""
+    media_dir = os.path.join(out_dir, 'media')
+    os.makedirs(media_dir, exist_ok=True)
+    paths = []
+    for k in range(count):
+        extension, first, later = MEDIA_KINDS[k % len(MEDIA_KINDS)]
+        path = os.path.join(media_dir, f'media{k}.{extension}')
+        if extension == 'wav':
+            with wave.open(path, 'wb') as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(8000)
+                f.writeframes(b'\0' * 1600)
+        else:
+            with open(path, 'wb') as f:
+                f.write(first if k < len(MEDIA_KINDS) else later)
+        paths.append(path)
+    return paths
+
+def generate(out_dir, options):
+    """Writes the corpus and returns the .exo paths, root scene first."""
+    rng = random.Random(options.seed)
+    os.makedirs(out_dir, exist_ok=True)
+    out_dir = os.path.abspath(out_dir)  # 相対パスのままだと、out_dir に移って変換したときにメディアが見つからない
+    anim_names = write_scripts(out_dir, options.scripts, rng)
+    anim_names += ['', '存在しない効果']  # 空欄は震える扱い、もう一つは未解決の警告になる
+    write_effect_conf(out_dir)
+    media = write_media(out_dir, options.media)
+    media.append(os.path.join(out_dir, 'media', 'missing.mp4'))
+    context = {"media": media, "images": [os.path.join(out_dir, 'media', 'image.png')]}
+
+    scene_count = max(1, options.scenes + 1)
+    exo_paths = []
+    for scene_num in range(scene_count):
+        object_count = options.objects // scene_count
+        if scene_num == 0:
+            object_count += options.objects % scene_count
+        context["child_scenes"] = child_scenes(options.scene_layout, scene_num, scene_count)
+        name = 'Root.exo' if scene_num == 0 else f'Scene{scene_num}.exo'
+        path = os.path.join(out_dir, name)
+        lines = scene_lines(rng, options, object_count, context, anim_names)
+        with open(path, 'w', encoding='shift_jis', newline='\r\n') as f:
+            f.write("\n".join(lines) + "\n")
+        exo_paths.append(path)
+    return exo_paths
+
+def add_corpus_arguments(arg_parser):
+    arg_parser.add_argument("--objects", type=int, default=1000, help="objects in the whole project (default: 1000)")
+    arg_parser.add_argument("--scenes", type=int, default=2, help="scenes besides the root scene (default: 2)")
+    arg_parser.add_argument("--scene-layout", choices=SCENE_LAYOUTS, default='flat',
+                            help="flat: the root uses every scene, chain: each scene uses the next, tree: binary tree")
+    arg_parser.add_argument("--filters-per-object", type=int, default=3, help="maximum filters per object (default: 3)")
+    arg_parser.add_argument("--effect-mix", help="object type weights, e.g. 'テキスト:3,図形:2,動画ファイル:1' (default: all of PARAM_MAP equally)")
+    arg_parser.add_argument("--animated-ratio", type=float, default=0.3, help="share of tracks that move (default: 0.3)")
+    arg_parser.add_argument("--text-length", type=int, default=16, help="characters of hex encoded text (default: 16)")
+    arg_parser.add_argument("--chain-ratio", type=float, default=0.1, help="share of objects starting a mid-point chain (default: 0.1)")
+    arg_parser.add_argument("--chain-length", type=int, default=3, help="objects per mid-point chain (default: 3)")
+    arg_parser.add_argument("--layers", type=int, default=20, help="layers to spread the objects over (default: 20)")
+    arg_parser.add_argument("--scripts", type=int, default=40, help="fake animation script files (default: 40)")
+    arg_parser.add_argument("--media", type=int, default=4, help="fake media files (default: 4)")
+    arg_parser.add_argument("--seed", type=int, default=1)
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Generate a synthetic .exo project for exo_to_aup2.py")
+    arg_parser.add_argument("out_dir")
+    add_corpus_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    paths = generate(args.out_dir, args)
+    print(f"Wrote {len(paths)} scenes to {args.out_dir}. Convert it from that directory with:")
+    print("python exo_to_aup2.py " + " ".join(os.path.basename(path) for path in paths) + " output.aup2")
@@ -0,0 +1,173 @@
+"""Times each phase of exo_to_aup2.py on synthetic projects and records the results as JSON.
+
+For every scale a corpus is generated with make_exo_corpus.py (same seed, so the inputs are
+the same across versions) and converted --repeat times. The best time of each phase is kept:
+
+    scanning       scanning the .exo files for animation effects and media files
+    map_loading    effect.conf, Script/ and the converter tables
+    media_probing  reading the FPS of the media files
+    parsing        reading the scene headers and objects
+    conversion     converting the objects (parsing excluded)
+    writing        formatting and writing the .aup2 (parsing and conversion excluded)
+    total          all of the above, as the command line runs them
+
+    python benchmark/run_benchmark.py --scales 1000,10000 --output bench.json
+    python benchmark/run_benchmark.py --scales 1000,10000 --compare bench.json
+"""
+import os
+import sys
+import io
+import json
+import time
+import platform
+import argparse
+import tempfile
+import contextlib
+import subprocess
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..'))
+import exo_to_aup2
+from make_exo_corpus import generate, add_corpus_arguments
+
+PHASES = ['scanning', 'map_loading', 'media_probing', 'parsing', 'conversion', 'writing', 'total']
+
+def clear_caches():
+    """Forgets everything memoized in the converter, so every run starts cold."""
+    exo_to_aup2.translate_track_value.cache_clear()
+    exo_to_aup2.decode_CurveEditor_bezier.cache_clear()
+
+def run_once(exo_paths, output_path):
+    """Converts the corpus in the current directory once and returns {phase: seconds}."""
+    clear_caches()
+    timings = {}
+    started = time.perf_counter()
+    anim_names, media_paths = exo_to_aup2.scan_exo_references(exo_paths)
+    timings["scanning"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    effect_map = exo_to_aup2.parse_effect_conf('AviUtl2_doc/effect.conf')
+    anim_map = exo_to_aup2.parse_all_animation_scripts("./Script", None, anim_names)
+    converters = exo_to_aup2.compile_effect_converters(effect_map, anim_map)
+    timings["map_loading"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    video_fps = exo_to_aup2.probe_all_media_fps(media_paths)
+    timings["media_probing"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    hedders = [exo_to_aup2.read_exo_header(path) for path in exo_paths]
+    for path in exo_paths:
+        for _ in exo_to_aup2.iter_exo_objects(path):
+            pass
+    timings["parsing"] = time.perf_counter() - started
+
+    context = {
+        "effect_map": effect_map,
+        "anim_map": anim_map,
+        "converters": converters,
+        "video_fps": video_fps,
+        "scene_hedders": [hedder for hedder in hedders if hedder],
+        "default_scene": 1,
+        "merge_chains": False,
+    }
+    started = time.perf_counter()
+    for exo_num, path in enumerate(exo_paths):
+        for _ in exo_to_aup2.convert_scene_objects(context, exo_num, path):
+            pass
+    timings["conversion"] = max(0.0, time.perf_counter() - started - timings["parsing"])
+
+    clear_caches()
+    started = time.perf_counter()
+    exo_to_aup2.convert_project(exo_paths, output_path, effect_map, anim_map, video_fps, converters=converters)
+    project_time = time.perf_counter() - started
+    timings["writing"] = max(0.0, project_time - timings["parsing"] - timings["conversion"])
+    timings["total"] = timings["scanning"] + timings["map_loading"] + timings["media_probing"] + project_time
+    return timings
+
+def run_scale(work_dir, objects, options):
+    """Generates a corpus of the given size and returns its result entry."""
+    corpus_dir = os.path.join(work_dir, f"objects_{objects}")
+    options.objects = objects
+    exo_paths = [os.path.basename(path) for path in generate(corpus_dir, options)]
+    output_path = os.path.join(corpus_dir, 'output.aup2')
+    cwd = os.getcwd()
+    os.chdir(corpus_dir)  # 変換は Script/ と AviUtl2_doc/ を作業ディレクトリから読む
+    try:
+        runs = []
+        for _ in range(options.repeat):
+            with contextlib.redirect_stdout(io.StringIO()):
+                runs.append(run_once(exo_paths, output_path))
+    finally:
+        os.chdir(cwd)
+    best = {phase: min(run[phase] for run in runs) for phase in PHASES}
+    return {
+        "objects": objects,
+        "input_bytes": sum(os.path.getsize(os.path.join(corpus_dir, path)) for path in exo_paths),
+        "output_bytes": os.path.getsize(output_path),
+        "seconds": best,
+        "objects_per_second": objects / best["total"] if best["total"] else None,
+        "runs": runs,
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_results(results, previous=None):
+    previous_by_scale = {entry["objects"]: entry for entry in (previous or {}).get("results", [])}
+    print("objects  " + "".join(f"{phase:>15}" for phase in PHASES))
+    for entry in results:
+        cells = []
+        old = previous_by_scale.get(entry["objects"])
+        for phase in PHASES:
+            cell = f"{entry['seconds'][phase]:.3f}s"
+            if old and old["seconds"].get(phase):
+                cell += f" x{entry['seconds'][phase] / old['seconds'][phase]:.2f}"
+            cells.append(f"{cell:>15}")
+        print(f"{entry['objects']:<9}" + "".join(cells))
+    if previous:
+        print(f"(xN: time relative to {previous.get('label') or previous.get('revision')})")
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Benchmark exo_to_aup2.py on synthetic projects")
+    arg_parser.add_argument("--scales", default="1000,10000", help="comma separated object counts (default: 1000,10000)")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="runs per scale; the best time is kept (default: 3)")
+    arg_parser.add_argument("--output", help="write the results to this JSON file")
+    arg_parser.add_argument("--compare", metavar="JSON", help="show times relative to an earlier --output file")
+    arg_parser.add_argument("--label", help="name of this run in the JSON (default: the git revision)")
+    arg_parser.add_argument("--work-dir", help="where to generate the corpora (default: a temporary directory)")
+    add_corpus_arguments(arg_parser)
+    args = arg_parser.parse_args()
+
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+
+    with contextlib.ExitStack() as stack:
+        work_dir = args.work_dir or stack.enter_context(tempfile.TemporaryDirectory(prefix='exo_bench_'))
+        results = []
+        for objects in [int(scale) for scale in args.scales.split(',')]:
+            print(f"Benchmarking {objects} objects...", file=sys.stderr)
+            results.append(run_scale(os.path.abspath(work_dir), objects, args))
+
+    corpus = {key: value for key, value in vars(args).items()
+              if key not in ('scales', 'repeat', 'output', 'compare', 'label', 'work_dir', 'objects')}
+    report = {
+        "label": args.label,
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "repeat": args.repeat,
+        "corpus": corpus,
+        "results": results,
+    }
+    print_results(results, previous)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
@@ -3,9 +3,27 @@ import pprint
 import glob
 import os
 import re
-import cv2
 import math
 import binascii
+import argparse
+import functools
+import hashlib
+import pickle
+import struct
+import io
+import codecs
+import json
+import contextlib
+import traceback
+import time
+import queue
+import threading
+import tracemalloc
+import cProfile
+from collections import ChainMap, namedtuple
+from collections.abc import Mapping
+from fractions import Fraction
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
 
 
 PARAM_MAP = {
@@ -125,6 +143,196 @@ EFFECT_RENAME_MAP = {
     'シャドー': 'ドロップシャドウ'
 }
 
+# .aup2 は数万セクションになるので大きめのバッファで書き出す
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+# convert が出力を返すときの一度に渡す大きさ (文字数)
+STREAM_CHUNK_SIZE = 64 * 1024
+
+EFFECT_CONF_PATH = 'AviUtl2_doc/effect.conf'
+SCRIPT_DIR = './Script'
+
+# Script/*.anm* と effect.conf の解析結果のキャッシュ
+MAP_CACHE_PATH = '.exo_to_aup2_cache/maps.pickle'
+MAP_CACHE_VERSION = 2
+
+# 変換済みのシーンのキャッシュ (出力と同じくらいの大きさになるので別のファイル)
+FRAGMENT_CACHE_PATH = '.exo_to_aup2_cache/fragments.pickle'
+
+# --watch で入力ファイルの変更を確認する間隔 (秒)
+WATCH_INTERVAL = 0.2
+
+# --scan で項目ごとに表示する数 (すべてはレポートに入る)
+SCAN_PRINT_LIMIT = 20
+
+# FPS が読めなかった動画・音声ファイルに使う値
+DEFAULT_FPS = 30
+
+# 変換済みのトラック値を覚えておく数
+TRACK_CACHE_SIZE = 8192
+
+# Section がキーの並びを共有する数の上限 (長く動くプロセスで増え続けないように)
+SECTION_LAYOUT_LIMIT = 4096
+
+# .exo を読み込む単位 (バイト) と、デコード結果を覚えておく行数
+EXO_READ_SIZE = 1024 * 1024
+EXO_LINE_CACHE_SIZE = 4096
+
+# --pipeline で各段のあいだに溜めておく数 (.exo のブロック、出力のチャンク)
+PIPELINE_DEPTH = 4
+
+# 参照の読み取りで見る行: セクションの見出しと _name= / name= / file=
+# (行頭の ^ より改行から探すほうがずっと速いので、ブロックの前に改行を付けて探す)
+EXO_REFERENCE_LINE_RE = re.compile(rb'\n(?:\[|(_name|name|file)=([^\r\n]*))')
+# シーンの参照の読み取りで見る行: セクションの見出しと _name= / scene=
+EXO_SCENE_LINE_RE = re.compile(rb'\n(?:\[([^\r\n]*)|(_name|scene)=([^\r\n]*))')
+
+# --stats で集める処理時間や件数。空のときは何も記録しない
+STATS = {}
+
+def start_stats(trace_memory=False):
+    """Starts collecting stats into STATS, with tracemalloc as well if trace_memory."""
+    STATS.clear()
+    STATS.update({"started": time.perf_counter(), "phases": {}, "scenes": [], "counters": {}, "worker_caches": {}})
+    if trace_memory:
+        tracemalloc.start()
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def add_phase_stats(name, seconds, calls=1):
+    phase = STATS["phases"].setdefault(name, {"seconds": 0.0, "calls": 0})
+    phase["seconds"] += seconds
+    phase["calls"] += calls
+    if tracemalloc.is_tracing():
+        phase["traced_peak_bytes"] = max(phase.get("traced_peak_bytes", 0), tracemalloc.get_traced_memory()[1])
+
+def reset_traced_peak():
+    """Starts a new tracemalloc peak for the next phase, keeping the peak of the whole run."""
+    STATS["traced_peak_bytes"] = max(STATS.get("traced_peak_bytes", 0), tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+
+@contextlib.contextmanager
+def stats_phase(name):
+    """Adds the wall time and memory peak of the with block to the named phase."""
+    if not STATS:
+        yield
+        return
+    if tracemalloc.is_tracing():
+        reset_traced_peak()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase_stats(name, time.perf_counter() - started)
+
+def count_stat(group, name, count=1):
+    if STATS:
+        counter = STATS["counters"].setdefault(group, {})
+        counter[name] = counter.get(name, 0) + count
+
+@contextlib.contextmanager
+def stats_scene(input_exo_path, write_phase="output_write"):
+    """Times one scene. Its parse and convert times are added by stats_iter, the rest goes to
+    write_phase: writing the output, or "scene_format" when the scene is formatted apart from it.
+    """
+    if not STATS:
+        yield
+        return
+    scene = {"path": str(input_exo_path), "objects": 0, "parse_seconds": 0.0, "convert_seconds": 0.0, "write_seconds": 0.0,
+             "write_phase": write_phase}
+    STATS["scenes"].append(scene)
+    if tracemalloc.is_tracing():
+        reset_traced_peak()
+    started = time.perf_counter()
+    try:
+        yield scene
+    finally:
+        # convert_seconds には stats_iter で測った解析の時間も入っている
+        scene["convert_seconds"] -= scene["parse_seconds"]
+        scene["write_seconds"] += time.perf_counter() - started - scene["convert_seconds"] - scene["parse_seconds"]
+        add_scene_phases(scene)
+
+def add_scene_phases(scene):
+    add_phase_stats("scene_parse", scene["parse_seconds"])
+    add_phase_stats("scene_convert", scene["convert_seconds"])
+    add_phase_stats(scene["write_phase"], scene["write_seconds"])
+
+def stats_iter(iterable, key):
+    """Adds the time spent inside iterable to key of the current scene's stats."""
+    if not STATS:
+        return iterable
+    return timed_iter(iterable, STATS["scenes"][-1], key)
+
+def timed_iter(iterable, record, key):
+    iterator = iter(iterable)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            record[key] += time.perf_counter() - started
+            return
+        record[key] += time.perf_counter() - started
+        yield item
+
+def memo_cache_stats():
+    return {func.__name__: func.cache_info()._asdict() for func in (translate_track_value, decode_CurveEditor_bezier)}
+
+def worker_stats():
+    """The stats a worker process collected for one task, to be merged with merge_worker_stats."""
+    stats = {key: STATS[key] for key in ("phases", "scenes", "counters")}
+    stats["pid"] = os.getpid()
+    stats["caches"] = memo_cache_stats()
+    return stats
+
+def merge_worker_stats(stats):
+    if not STATS or not stats:
+        return
+    for name, phase in stats["phases"].items():
+        merged = STATS["phases"].setdefault(name, {"seconds": 0.0, "calls": 0})
+        merged["seconds"] += phase["seconds"]
+        merged["calls"] += phase["calls"]
+    STATS["scenes"].extend(stats["scenes"])
+    for group, counter in stats["counters"].items():
+        for name, count in counter.items():
+            count_stat(group, name, count)
+    # lru_cache の値はワーカーごとの累計なので最後のものを使う
+    STATS["worker_caches"][stats["pid"]] = stats["caches"]
+
+def finish_stats(stats_path=None):
+    """Stops collecting and writes STATS as JSON to stats_path, or returns it if not given."""
+    caches = memo_cache_stats()
+    for worker_caches in STATS["worker_caches"].values():
+        for name, info in worker_caches.items():
+            for key in ("hits", "misses", "currsize"):
+                caches[name][key] += info[key]
+    report = {
+        "seconds": time.perf_counter() - STATS["started"],
+        "peak_rss_kb": peak_rss_kb(),
+        "phases": STATS["phases"],
+        "scenes": STATS["scenes"],
+        "counters": STATS["counters"],
+        "caches": caches,
+    }
+    if tracemalloc.is_tracing():
+        report["traced_peak_bytes"] = max(STATS.get("traced_peak_bytes", 0), tracemalloc.get_traced_memory()[1])
+        report["top_allocations"] = [
+            {"location": str(stat.traceback), "bytes": stat.size, "blocks": stat.count}
+            for stat in tracemalloc.take_snapshot().statistics('lineno')[:25]
+        ]
+        tracemalloc.stop()
+    STATS.clear()
+    if stats_path:
+        with open(stats_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
 def json_to_exo(json_data, heddername):
     exo_lines = []
     exo_lines.append(f"[{heddername}]")
@@ -143,32 +351,242 @@ def json_to_exo(json_data, heddername):
     
     return "\n".join(exo_lines)
 
+def write_section(out, json_data, heddername):
+    """Writes one [heddername] section to out, replacing characters AviUtl2 can't read."""
+    out.write(json_to_exo(json_data, heddername).replace("〜", "～") + "\n")
+
 def overwrite_value(obj_dict, conv_map, no_remove=False):
     new_dict = {}
     for k, v in obj_dict.items():
         if k in conv_map:
-            parsed = parse_easing_nums(v)
-            if parsed != v:
-                new_dict[conv_map[k]] = parsed
-            else:
-                new_dict[conv_map[k]] = v
+            # カンマのない値は定数なのでそのまま
+            new_dict[conv_map[k]] = translate_track_value(v) if ',' in v else v
         elif no_remove:
             new_dict[k] = v
     return new_dict
 
+class MemoryExo(namedtuple('MemoryExo', 'name data')):
+    """An .exo file given to convert as bytes. name is used where the file name is shown."""
+    __slots__ = ()
+
+    def __str__(self):
+        return self.name
+
+def open_exo(exo_path, binary=False):
+    """Opens an .exo file, or a MemoryExo, as Shift_JIS text or as bytes."""
+    if isinstance(exo_path, MemoryExo):
+        data = io.BytesIO(exo_path.data)
+        return data if binary else io.TextIOWrapper(data, encoding='shift_jis')
+    if binary:
+        return open(exo_path, 'rb')
+    return open(exo_path, 'r', encoding='shift_jis')
+
+# キーの並び -> {キー: 位置}。同じ効果のセクションはみな同じ並びになる
+SECTION_LAYOUTS = {}
+
+class Section(Mapping):
+    """A parsed .exo section: a read-only mapping of its keys to their string values.
+
+    Only the values are stored per section. The keys and their positions are shared by all
+    sections with the same keys in the same order, which is nearly every section of an effect.
+    """
+    __slots__ = ('_index', '_values')
+
+    def __init__(self, items):
+        layout = tuple(items)
+        index = SECTION_LAYOUTS.get(layout)
+        if index is None:
+            index = {sys.intern(key): i for i, key in enumerate(layout)}
+            if len(SECTION_LAYOUTS) < SECTION_LAYOUT_LIMIT:
+                SECTION_LAYOUTS[layout] = index
+        self._index = index
+        self._values = tuple(items.values())
+
+    def __getitem__(self, key):
+        return self._values[self._index[key]]
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def get(self, key, default=None):
+        i = self._index.get(key)
+        return default if i is None else self._values[i]
+
+    def keys(self):
+        return self._index.keys()
+
+    def values(self):
+        return self._values
+
+    def items(self):
+        return zip(self._index, self._values)
+
+    def replace(self, key, value):
+        """Returns a copy with the value of key changed."""
+        return Section({**self, key: value})
+
+    def __reduce__(self):
+        return Section, (dict(self),)
+
+    def __repr__(self):
+        return f"Section({dict(self)!r})"
+
+def iter_exo_blocks(exo_path):
+    """Yields the bytes of an .exo file in blocks of about EXO_READ_SIZE that end at a line end.
+
+    Splitting the bytes is safe since '\r' and '\n' are never part of a Shift_JIS character.
+    """
+    if isinstance(exo_path, StreamedExo):
+        yield from exo_path.blocks
+        return
+    with open_exo(exo_path, binary=True) as f:
+        rest = b''
+        while True:
+            block = f.read(EXO_READ_SIZE)
+            if not block:
+                if rest:
+                    yield rest
+                return
+            block = rest + block
+            end = block.rfind(b'\n') + 1
+            yield block[:end]
+            rest = block[end:]
+
+class StreamedExo(namedtuple('StreamedExo', 'name blocks')):
+    """An .exo file whose blocks (see iter_exo_blocks) are read ahead by read_ahead."""
+    __slots__ = ()
+
+    def __str__(self):
+        return str(self.name)
+
+def iter_in_thread(iterable, depth=PIPELINE_DEPTH):
+    """Runs iterable on a thread, at most depth items ahead, and yields its items.
+
+    An error raised by iterable is raised again here. Closing the generator stops the thread.
+    """
+    items = queue.Queue(depth)
+    stop = threading.Event()
+
+    def fill():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                items.put((True, item))
+            items.put((False, None))
+        except BaseException as e:
+            items.put((False, e))
+
+    thread = threading.Thread(target=fill, daemon=True)
+    thread.start()
+    try:
+        while True:
+            ok, item = items.get()
+            if not ok:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        # put で待っているスレッドを動かして終わらせる
+        stop.set()
+        while thread.is_alive():
+            try:
+                items.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+def read_ahead(exo_paths):
+    """Reads the .exo files in order on a thread, PIPELINE_DEPTH blocks ahead of their parsing.
+
+    Returns a StreamedExo for each path. They have to be parsed in the same order, each to its end.
+    """
+    def read_all():
+        for exo_path in exo_paths:
+            yield from iter_exo_blocks(exo_path)
+            yield None
+
+    blocks = iter_in_thread(read_all())
+
+    def file_blocks():
+        for block in blocks:
+            if block is None:
+                return
+            yield block
+
+    return [StreamedExo(exo_path, file_blocks()) for exo_path in exo_paths]
+
+def iter_exo_lines(exo_path):
+    """Yields the stripped lines of an .exo file, decoded from Shift_JIS.
+
+    The blocks are split as latin-1, which only copies the bytes, so the ASCII lines (numbers,
+    hex text), which are most of the file, never go through the Shift_JIS decoder. The other
+    lines are decoded one by one, short ones once per file.
+    """
+    decoded_lines = {}
+    for block in iter_exo_blocks(exo_path):
+        for line in block.decode('latin-1').split('\n'):
+            if line.isascii():
+                yield line.strip()
+                continue
+            decoded = decoded_lines.get(line)
+            if decoded is None:
+                decoded = line.encode('latin-1').decode('shift_jis').strip()
+                if len(line) < 64 and len(decoded_lines) < EXO_LINE_CACHE_SIZE:
+                    decoded_lines[line] = decoded
+            yield decoded
+
+def iter_exo_sections(file_path):
+    """Yields (section_name, Section) pairs of an .exo file in file order."""
+    section_name = None
+    current_section = None
+    for line in iter_exo_lines(file_path):
+        if line.startswith('[') and line.endswith(']'):
+            if current_section is not None:
+                yield section_name, Section(current_section)
+            section_name = line[1:-1]
+            current_section = {}
+        elif '=' in line and current_section is not None:
+            key, value = line.split('=', 1)
+            current_section[key] = value
+    if current_section is not None:
+        yield section_name, Section(current_section)
+
+def iter_exo_objects(file_path):
+    """Yields (object, filters) for each [N] object of an .exo file in file order.
+
+    filters is the list of the object's [N.0], [N.1]... sections, so only one object is held
+    in memory at a time. Sections are expected in the order AviUtl writes them.
+    """
+    current_object = None
+    filters = []
+    for section_name, section in iter_exo_sections(file_path):
+        head, dot, _ = section_name.partition('.')
+        if not head.isdigit():
+            continue
+        if not dot:
+            if current_object is not None:
+                yield current_object, filters
+            current_object = section
+            filters = []
+        elif current_object is not None:
+            filters.append(section)
+    if current_object is not None:
+        yield current_object, filters
+
 def parse_exo(file_path):
     exo_data = {}
-    current_section = None
     try:
-        with open(file_path, 'r', encoding='shift_jis') as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith('[') and line.endswith(']'):
-                    section_name = line[1:-1]
-                    current_section = exo_data.setdefault(section_name, {})
-                elif '=' in line and current_section is not None:
-                    key, value = line.split('=', 1)
-                    current_section[key] = value
+        for section_name, section in iter_exo_sections(file_path):
+            if section_name in exo_data:
+                section = Section({**exo_data[section_name], **section})
+            exo_data[section_name] = section
     except FileNotFoundError:
         print(f"Error: File not found at {file_path}")
         return None
@@ -177,6 +595,20 @@ def parse_exo(file_path):
         return None
     return exo_data
 
+def read_exo_header(file_path):
+    """Reads only the [exedit] section of an .exo file, without parsing its objects."""
+    try:
+        for section_name, section in iter_exo_sections(file_path):
+            if section_name == "exedit":
+                return dict(section)
+            if section_name[:1].isdigit():
+                break
+    except FileNotFoundError:
+        print(f"Error: File not found at {file_path}")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+    return None
+
 def parse_easing_nums(easing_str):
     # exo: "0.0,100.0,15@イージング（通常）@イージング,14"
     # aup2: "0.00,100.00,イージング（通常）@イージング,0|14"
@@ -208,6 +640,11 @@ def parse_easing_nums(easing_str):
     # v1,v2,easing_name,0|fourth
     return f"{v1},{v2},{easing_name},0|{fourth}"
 
+@functools.lru_cache(maxsize=TRACK_CACHE_SIZE)
+def translate_track_value(easing_str):
+    """parse_easing_nums with the result cached, since projects reuse the same track strings."""
+    return parse_easing_nums(easing_str)
+
 def parse_effect_conf(file_path):
     anim_map = {}
     in_anim_section = False
@@ -233,6 +670,25 @@ def parse_effect_conf(file_path):
         print(f"Error parsing effect.conf: {e}", file=sys.stderr)
     return anim_map
 
+def animation_effect_name(file_path, line):
+    """Returns the effect name declared by an '@' line of an animation script."""
+    if file_path.split("\\")[-1][0] == "@":
+        return line[1:].split('@', 1)[0] + file_path.split("\\")[-1].split(".")[0]
+    return line[1:].split('@', 1)[0]
+
+def index_animation_script(file_path):
+    """Lists the effect names an animation script defines, without parsing their parameters."""
+    encoding = 'shift_jis' if file_path.endswith('.anm') else 'utf-8'
+    effect_names = []
+    try:
+        with open(file_path, 'r', encoding=encoding, errors='ignore') as f:
+            for line in f:
+                if line.lstrip().startswith('@'):
+                    effect_names.append(animation_effect_name(file_path, line.strip()))
+    except Exception as e:
+        print(f"Error indexing animation script {file_path} with encoding {encoding}: {e}", file=sys.stderr)
+    return effect_names
+
 def parse_animation_script(file_path):
     """Parses an animation script file (.anm, .anm2) to get parameter mappings."""
     anim_map = {}
@@ -247,10 +703,7 @@ def parse_animation_script(file_path):
             for line in f:
                 line = line.strip()
                 if line.startswith('@'):
-                    if file_path.split("\\")[-1][0] == "@":
-                        current_effect = line[1:].split('@', 1)[0] + file_path.split("\\")[-1].split(".")[0]
-                    else:
-                        current_effect = line[1:].split('@', 1)[0]
+                    current_effect = animation_effect_name(file_path, line)
                     anim_map[current_effect] = {}
                 elif current_effect and line.startswith('--'):
                     match = param_re.match(line)
@@ -265,20 +718,420 @@ def parse_animation_script(file_path):
         print(f"Error parsing animation script {file_path} with encoding {encoding}: {e}", file=sys.stderr)
     return anim_map
 
-def parse_all_animation_scripts(directory):
-    """Parses all .anm and .anm2 files in a directory and merges the results."""
+def parse_all_animation_scripts(directory, cache=None, effect_names=None):
+    """Parses all .anm and .anm2 files in a directory and merges the results.
+
+    If effect_names is given, only the files defining one of those effects are parsed, and only
+    those effects are returned.
+    """
     all_param_maps = {}
     script_files = glob.glob(os.path.join(directory, '*.anm*'))
 
     for script_file in script_files:
-        parsed_map = parse_animation_script(script_file)
+        if effect_names is not None:
+            if effect_names.isdisjoint(cached_parse(cache, script_file, index_animation_script)):
+                continue
+        parsed_map = cached_parse(cache, script_file, parse_animation_script)
         for effect, params in parsed_map.items():
+            if effect_names is not None and effect not in effect_names:
+                continue
             if effect not in all_param_maps:
                 all_param_maps[effect] = {}
             all_param_maps[effect].update(params)
             
     return all_param_maps
 
+def scan_exo_references(exo_paths, cache=None):
+    """Collects the animation effect names and media file paths the given .exo files refer to."""
+    anim_names = set()
+    media_paths = set()
+    for exo_path in exo_paths:
+        file_anim_names, file_media_paths = cached_parse(cache, exo_path, scan_exo_file_references)
+        anim_names |= file_anim_names
+        media_paths |= file_media_paths
+    return anim_names, media_paths
+
+def scan_exo_file_references(exo_path):
+    anim_names = set()
+    media_paths = set()
+    anim_name = None
+    in_media = False
+    try:
+        # 必要な行だけを正規表現で拾い、その値だけをデコードする
+        for block in iter_exo_blocks(exo_path):
+            for match in EXO_REFERENCE_LINE_RE.finditer(b'\n' + block):
+                key = match.group(1)
+                if key is None:
+                    if anim_name is not None:
+                        anim_names.add(anim_name)
+                    anim_name = None
+                    in_media = False
+                elif key == b'_name':
+                    effect_name = match.group(2).decode('shift_jis').strip()
+                    if effect_name in ["アニメーション効果", "カスタムオブジェクト"]:
+                        anim_name = "震える"
+                    in_media = effect_name in ["音声ファイル", "動画ファイル"]
+                elif anim_name is not None and key == b'name':
+                    anim_name = match.group(2).decode('shift_jis').strip() or "震える"
+                elif in_media and key == b'file':
+                    file_path = match.group(2).decode('shift_jis').strip()
+                    if file_path:
+                        media_paths.add(file_path)
+    except (OSError, UnicodeDecodeError):
+        return anim_names, media_paths  # 読めないファイルはヘッダーの読み込みで報告される
+    if anim_name is not None:
+        anim_names.add(anim_name)
+    return anim_names, media_paths
+
+def iter_mp4_boxes(f, start, end):
+    """Yields (type, payload_start, payload_end) for the MP4/MOV boxes between start and end."""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        size, box_type = struct.unpack('>I4s', f.read(8))
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size:
+            return
+        yield box_type, pos + header_size, min(pos + size, end)
+        pos += size
+
+def find_mp4_box(f, start, end, box_type):
+    for child_type, child_start, child_end in iter_mp4_boxes(f, start, end):
+        if child_type == box_type:
+            return child_start, child_end
+    return None
+
+def read_mp4_fps(f, file_size):
+    """Reads the frame rate of the first video track from mdhd and stts, seeking past mdat."""
+    moov = find_mp4_box(f, 0, file_size, b'moov')
+    if moov is None:
+        return None
+    has_audio = False
+    for box_type, trak_start, trak_end in iter_mp4_boxes(f, *moov):
+        if box_type != b'trak':
+            continue
+        mdia = find_mp4_box(f, trak_start, trak_end, b'mdia')
+        hdlr = mdia and find_mp4_box(f, *mdia, b'hdlr')
+        if not hdlr:
+            continue
+        f.seek(hdlr[0] + 8)
+        handler_type = f.read(4)
+        if handler_type == b'soun':
+            has_audio = True
+        if handler_type != b'vide':
+            continue
+
+        mdhd = find_mp4_box(f, *mdia, b'mdhd')
+        minf = find_mp4_box(f, *mdia, b'minf')
+        stbl = minf and find_mp4_box(f, *minf, b'stbl')
+        stts = stbl and find_mp4_box(f, *stbl, b'stts')
+        if not mdhd or not stts:
+            return None
+        f.seek(mdhd[0])
+        version = f.read(1)[0]
+        f.seek(mdhd[0] + (20 if version == 1 else 12))
+        timescale = struct.unpack('>I', f.read(4))[0]
+        f.seek(stts[0] + 4)
+        # 壊れたファイルで巨大な数を読まないよう、stts に収まる数までにする
+        entry_count = min(struct.unpack('>I', f.read(4))[0], max(0, (stts[1] - stts[0] - 8) // 8))
+        entries = struct.unpack(f'>{entry_count * 2}I', f.read(entry_count * 8))
+        sample_count = sum(entries[0::2])
+        duration = sum(count * delta for count, delta in zip(entries[0::2], entries[1::2]))
+        if not timescale or not duration:
+            return None
+        return float(Fraction(sample_count * timescale, duration))
+    return DEFAULT_FPS if has_audio else None
+
+def read_avi_fps(f):
+    """Reads the frame rate from the strh of the video stream, or the avih frame period."""
+    micro_sec_per_frame = None
+    file_end = f.seek(0, os.SEEK_END)
+    pos = 12
+    while pos + 8 <= file_end:
+        f.seek(pos)
+        chunk_id, size = struct.unpack('<4sI', f.read(8))
+        if chunk_id == b'LIST':
+            list_type = f.read(4)
+            if list_type == b'movi':
+                break  # ヘッダーはここまで
+            if list_type in (b'hdrl', b'strl'):
+                pos += 12
+                continue
+        elif chunk_id == b'avih':
+            micro_sec_per_frame = struct.unpack('<I', f.read(4))[0]
+        elif chunk_id == b'strh':
+            fcc_type, = struct.unpack('<4s', f.read(4))
+            f.seek(pos + 8 + 20)
+            scale, rate = struct.unpack('<II', f.read(8))
+            if fcc_type == b'vids' and scale and rate:
+                return float(Fraction(rate, scale))
+        pos += 8 + size + (size & 1)
+    if micro_sec_per_frame:
+        return 1000000 / micro_sec_per_frame
+    return None
+
+def read_ebml_vint(f, keep_marker=False):
+    first = f.read(1)
+    if not first:
+        raise EOFError
+    length = 1
+    while length <= 8 and not first[0] & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8:
+        raise ValueError("invalid EBML variable length integer")
+    value = first[0] if keep_marker else first[0] & (0xFF >> length)
+    for byte in f.read(length - 1):
+        value = (value << 8) | byte
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return None  # 長さ不明
+    return value
+
+def iter_ebml_elements(f, start, end):
+    """Yields (id, data_start, data_end) for the EBML elements between start and end.
+
+    data_end never goes past end, even if the element claims to be larger.
+    """
+    pos = start
+    while pos < end:
+        f.seek(pos)
+        element_id = read_ebml_vint(f, keep_marker=True)
+        size = read_ebml_vint(f)
+        data_start = f.tell()
+        data_end = end if size is None else min(data_start + size, end)
+        yield element_id, data_start, data_end
+        if size is None:
+            return
+        pos = data_end
+
+def read_matroska_fps(f, file_size):
+    """Reads the frame rate of the first video track from its DefaultDuration."""
+    for element_id, segment_start, segment_end in iter_ebml_elements(f, 0, file_size):
+        if element_id != 0x18538067:  # Segment
+            continue
+        has_audio = False
+        for child_id, tracks_start, tracks_end in iter_ebml_elements(f, segment_start, segment_end):
+            if child_id == 0x1F43B675:  # Cluster (Tracks より後ろには来ない)
+                return None
+            if child_id != 0x1654AE6B:  # Tracks
+                continue
+            for entry_id, entry_start, entry_end in iter_ebml_elements(f, tracks_start, tracks_end):
+                if entry_id != 0xAE:  # TrackEntry
+                    continue
+                track_type = None
+                default_duration = None
+                for field_id, field_start, field_end in iter_ebml_elements(f, entry_start, entry_end):
+                    if field_id in (0x83, 0x23E383):  # TrackType, DefaultDuration
+                        f.seek(field_start)
+                        value = int.from_bytes(f.read(min(field_end - field_start, 8)), 'big')
+                        if field_id == 0x83:
+                            track_type = value
+                        else:
+                            default_duration = value
+                if track_type == 2:
+                    has_audio = True
+                if track_type == 1:
+                    if not default_duration:
+                        return None
+                    # DefaultDuration はナノ秒に丸められているので 24000/1001 などに戻す
+                    fps = Fraction(1000000000, default_duration).limit_denominator(1001)
+                    if round(1000000000 / fps) != default_duration:
+                        fps = Fraction(1000000000, default_duration)
+                    return float(fps)
+            return DEFAULT_FPS if has_audio else None
+    return None
+
+def read_container_fps(file_path):
+    """Reads the frame rate straight from the container header without decoding anything.
+
+    Handles MP4/MOV, AVI, Matroska/WebM and audio-only files (WAV, MP3, FLAC, Ogg), which get
+    DEFAULT_FPS like OpenCV would give them. Returns None for anything it can't read.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(64)
+            file_size = f.seek(0, os.SEEK_END)
+            if head[:4] == b'RIFF' and head[8:12] == b'AVI ':
+                return read_avi_fps(f)
+            if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+                return DEFAULT_FPS
+            if head[:4] == b'\x1a\x45\xdf\xa3':
+                return read_matroska_fps(f, file_size)
+            if head[4:8] in (b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pnot'):
+                return read_mp4_fps(f, file_size)
+            if head[:3] == b'ID3' or head[:4] == b'fLaC' or (head[:1] == b'\xff' and head[1] & 0xE0 == 0xE0):
+                return DEFAULT_FPS
+            if head[:4] == b'OggS' and (b'\x01vorbis' in head or b'OpusHead' in head):
+                return DEFAULT_FPS
+    except (OSError, EOFError, ValueError, IndexError, TypeError, struct.error, ZeroDivisionError):
+        pass
+    return None
+
+def probe_media_fps(file_path):
+    """Reads the frame rate of a media file.
+
+    The container header is tried first; OpenCV, which is only imported here, is the fallback.
+    """
+    abs_file_path = os.path.abspath(file_path)
+    if not os.path.isfile(abs_file_path):
+        return DEFAULT_FPS
+    fps_value = read_container_fps(abs_file_path)
+    if fps_value:
+        return fps_value if fps_value > 1 else DEFAULT_FPS
+    fps_value = DEFAULT_FPS
+    try:
+        import cv2
+        cap = cv2.VideoCapture(abs_file_path)
+        if cap.isOpened():
+            fps_value = cap.get(cv2.CAP_PROP_FPS)
+            if not fps_value or fps_value <= 1:
+                fps_value = DEFAULT_FPS
+        cap.release()
+    except Exception:
+        fps_value = DEFAULT_FPS
+        print(f"Warning: Could not read FPS from video file '{abs_file_path}'. Using default value {DEFAULT_FPS}.")
+    return fps_value
+
+def probe_all_media_fps(file_paths, cache=None):
+    """Probes the frame rate of every media file concurrently and returns {path: fps}.
+
+    Results are cached by absolute path, size and mtime, so an unchanged file is never reopened.
+    """
+    with ThreadPoolExecutor() as executor:
+        video_fps = submit_media_probes(file_paths, executor, cache)
+        resolve_media_fps(video_fps)
+    return video_fps
+
+def submit_media_probes(file_paths, executor, cache=None):
+    """Starts probing the media files on executor without waiting for them.
+
+    Returns {path: fps}, where the files not in the cache have a Future of their fps instead.
+    finish_media waits only for the file it needs; resolve_media_fps waits for all of them.
+    """
+    video_fps = {}
+    pending = []
+    for file_path in file_paths:
+        try:
+            st = os.stat(file_path)
+            key = (os.path.abspath(file_path), st.st_size, st.st_mtime_ns)
+        except OSError:
+            key = None
+        if cache is not None and key in cache["media"]:
+            video_fps[file_path] = cache["media"][key]
+            count_stat("cache.media", "hits")
+        else:
+            pending.append((file_path, key))
+
+    if pending and cache is not None:
+        count_stat("cache.media", "misses", len(pending))
+    for file_path, key in pending:
+        video_fps[file_path] = executor.submit(probe_and_cache_media_fps, file_path, key, cache)
+    return video_fps
+
+def probe_and_cache_media_fps(file_path, key, cache):
+    fps_value = probe_media_fps(file_path)
+    if cache is not None and key is not None:
+        cache["media"][key] = fps_value
+        cache["dirty"] = True
+    return fps_value
+
+def resolve_media_fps(video_fps):
+    """Waits for the probes still running in video_fps and puts their results in place."""
+    for file_path, fps_value in list(video_fps.items()):
+        if isinstance(fps_value, Future):
+            video_fps[file_path] = fps_value.result()
+
+def load_map_cache(cache_path):
+    """Loads the parsed map cache. Returns an empty cache if it is missing or from another version."""
+    try:
+        with open(cache_path, 'rb') as f:
+            cache = pickle.load(f)
+        if cache.get("version") == MAP_CACHE_VERSION:
+            return cache
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Warning: Could not load cache {cache_path}: {e}", file=sys.stderr)
+    return {"version": MAP_CACHE_VERSION, "files": {}, "media": {}, "dirty": True}
+
+def save_map_cache(cache_path, cache):
+    """Writes the cache back if anything changed, dropping entries whose file is gone."""
+    if not cache.pop("dirty", False):
+        return
+    cache["files"] = {key: entry for key, entry in cache["files"].items() if os.path.exists(key[1])}
+    cache["media"] = {key: fps for key, fps in cache["media"].items() if os.path.exists(key[0])}
+    write_cache_file(cache_path, cache)
+
+def load_fragment_cache(cache_path):
+    """Loads the converted scene cache.
+
+    "scenes" maps the absolute path of each scene to (key, fragment) and "files" holds the
+    cached_parse results of the scans of the .exo files.
+    """
+    try:
+        with open(cache_path, 'rb') as f:
+            cache = pickle.load(f)
+        if cache.get("version") == MAP_CACHE_VERSION:
+            return cache
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Warning: Could not load cache {cache_path}: {e}", file=sys.stderr)
+    return {"version": MAP_CACHE_VERSION, "scenes": {}, "files": {}, "dirty": True}
+
+def save_fragment_cache(cache_path, cache):
+    """Writes the converted scene cache back if anything changed, dropping scenes whose file is gone."""
+    if not cache.pop("dirty", False):
+        return
+    cache["scenes"] = {path: entry for path, entry in cache["scenes"].items() if os.path.exists(path)}
+    cache["files"] = {key: entry for key, entry in cache["files"].items() if os.path.exists(key[1])}
+    write_cache_file(cache_path, cache)
+
+def write_cache_file(cache_path, cache):
+    try:
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: Could not write cache {cache_path}: {e}", file=sys.stderr)
+
+def cached_parse(cache, file_path, parser):
+    """Returns parser(file_path), reusing the cached result while the file is unchanged.
+
+    A file counts as unchanged when its size and mtime match, or failing that, its content hash.
+    """
+    if cache is None:
+        return parser(file_path)
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return parser(file_path)
+    key = (parser.__name__, os.path.abspath(file_path))
+    signature = (st.st_size, st.st_mtime_ns)
+    entry = cache["files"].get(key)
+    if entry and entry["signature"] == signature:
+        count_stat("cache." + parser.__name__, "hits")
+        return entry["result"]
+
+    with open(file_path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    cache["dirty"] = True
+    if entry and entry["digest"] == digest:
+        entry["signature"] = signature
+        count_stat("cache." + parser.__name__, "hits")
+        return entry["result"]
+    count_stat("cache." + parser.__name__, "misses")
+    result = parser(file_path)
+    cache["files"][key] = {"signature": signature, "digest": digest, "result": result}
+    return result
+
+@functools.lru_cache(maxsize=TRACK_CACHE_SIZE)
 def decode_CurveEditor_bezier(code):
     INT32_MAX = 2147483647
     tmp = 0
@@ -311,246 +1164,1281 @@ def decode_CurveEditor_bezier(code):
     return (x1, y1, x2, y2)
 
 def decode_exo_text(hex_str):
+    # 4096 桁の固定長で、テキストの後ろは NUL (4 桁の 0000) で埋められているので、
+    # 後ろがすべて 0 ならその手前だけをデコードする
+    text_hex = hex_str
+    end = hex_str.find('0000')
+    while end != -1 and end % 4:
+        end = hex_str.find('0000', end + 1)
+    if end != -1 and len(hex_str) % 4 == 0 and hex_str[end:] == '0' * (len(hex_str) - end):
+        text_hex = hex_str[:end]
     try:
-        byte_data = binascii.unhexlify(hex_str)
+        byte_data = binascii.unhexlify(text_hex)
         return byte_data.decode('utf-16-le').rstrip('\x00')
     except (binascii.Error, UnicodeDecodeError):
         return hex_str
     
 
-if __name__ == '__main__':
-    if len(sys.argv) < 3:
-        print("Usage: python exo_to_aup2-2.py <Root.exo> <Scene1.exo> <output.aup2>")
-        sys.exit(1)
+# 標準描画 / 映像再生 / 音声再生 の初期値
+STANDARD_DRAW_DEFAULTS = {
+    "effect.name" : "標準描画",
+    "X": 0.00,
+    "Y": 0.00,
+    "Z": 0.00,
+    "中心X": 0.00,
+    "中心Y": 0.00,
+    "中心Z": 0.00,
+    "X軸回転": 0.00,
+    "Y軸回転": 0.00,
+    "Z軸回転": 0.00,
+    "拡大率": 100.000,
+    "縦横比": 0.000,
+    "透明度": 0.00,
+    "合成モード": "通常",
+}
+VIDEO_DRAW_DEFAULTS = {**STANDARD_DRAW_DEFAULTS, "effect.name": "映像再生", "音量": 0.00}
+AUDIO_PLAY_DEFAULTS = {
+    "音量": 100.00,
+    "左右": 0.00,
+}
 
-    input_exo_paths = sys.argv[1:-1]
-    output_aup2_path = sys.argv[-1]
+# プラグインなどの効果の変換関数 (register_effect_converter で登録する)
+OBJECT_CONVERTERS = {}
+FILTER_CONVERTERS = {}
 
-    print("Parsing effect / animation scripts...")
-    effect_map = parse_effect_conf('AviUtl2_doc/effect.conf')
-    anim_map = parse_all_animation_scripts("./Script")
+def register_effect_converter(effect_name, converter, object_type=False):
+    """Registers a converter for an effect, or for an object type with object_type=True.
+
+    The converter is called as converter(old_effect, old_item_config, old_item_type, context),
+    where the .exo sections are read-only Sections, and returns the .aup2 section as a dict, or
+    None to drop the effect. Registered converters take precedence over the built-in ones.
+    Register them before load_maps or compile_effect_converters: tables compiled earlier,
+    and the worker processes converting with them, do not use later registrations.
+    """
+    if object_type:
+        OBJECT_CONVERTERS[effect_name] = converter
+    else:
+        FILTER_CONVERTERS[effect_name] = converter
+
+def finish_figure(item_type, old_item_type, old_item_config, context):
+    item_type["角を丸くする"] = "0"
+    item_type["図形の種類"] = VALUE_MAP["図形の種類"][old_item_type["type"]] if old_item_type.get("type") else VALUE_MAP["図形の種類"]["0"]
+
+def finish_text(item_type, old_item_type, old_item_config, context):
+    item_type["テキスト"] = decode_exo_text(old_item_type.get("text", ""))
+
+def finish_media(item_type, old_item_type, old_item_config, context):
+    if "再生位置" in item_type.keys():
+        item_type.pop("再生位置")
+
+    file_path = old_item_type.get("file")
+    if file_path and file_path not in context["video_fps"]:
+        context["video_fps"][file_path] = probe_media_fps(file_path)
+
+    fps = context["video_fps"].get(file_path, DEFAULT_FPS)
+    if isinstance(fps, Future):  # --pipeline ではまだ読み取り中のことがある
+        fps = context["video_fps"][file_path] = fps.result()
+    start = float(old_item_config.get("start", 0)) / fps
+    end = float(old_item_config.get("end", 0)) / fps
+    speed = float(old_item_type.get("再生速度", 1)) / 100
+    long = (end - start) * speed
+    video_start = float(old_item_type["再生位置"]) / fps
+    item_type["再生位置"] = f"{video_start},{video_start + long},再生範囲,0"
+
+def finish_scene(item_type, old_item_type, old_item_config, context):
+    if "scene" in old_item_type.keys():
+        context["default_scene"] = int(old_item_type["scene"])
+    else:
+        item_type["シーン"] = context["default_scene"]
 
-    # Cache Video fps
-    # Path:fps
-    video_fps = {
+    if "再生位置" in old_item_type.keys():
+        item_type["再生位置"] = (float(old_item_type["再生位置"]) - 1) / float(context["scene_hedders"][int(item_type["シーン"])]["rate"])
+
+    # 省いたシーン・まとめたシーンへの参照を付け直す
+    scene_remap = context.get("scene_remap")
+    if scene_remap and int(item_type["シーン"]) in scene_remap:
+        item_type["シーン"] = scene_remap[int(item_type["シーン"])]
+
+def finish_range(item_type, old_item_type, old_item_config, context):
+    if "range" in old_item_type:
+        item_type["対象レイヤー数"] = old_item_type["range"]
+    item_type.pop("range", None)
+
+OBJECT_FINISHERS = {
+    "図形": finish_figure,
+    "テキスト": finish_text,
+    "音声ファイル": finish_media,
+    "動画ファイル": finish_media,
+    "シーン": finish_scene,
+    "グループ制御": finish_range,
+    "カメラ制御": finish_range,
+}
+
+# 変換表にはないが OBJECT_FINISHERS が読むキー
+FINISHER_KEYS = {
+    "音声ファイル": {"再生位置"},
+    "動画ファイル": {"再生位置"},
+}
+
+def make_object_converter(effect_name, conv_map, finish=None):
+    """Builds the converter of an object type from its PARAM_MAP entry."""
+    def convert(old_item_type, old_item_config, _, context):
+        item_type = overwrite_value(old_item_type, conv_map)
+        if finish:
+            finish(item_type, old_item_type, old_item_config, context)
+        item_type["effect.name"] = effect_name
+        return item_type
+    return convert
+
+def convert_unknown_object(old_item_type, old_item_config, _, context):
+    print(f"Warning: Effect '{old_item_type['_name']}' not found in PARAM_MAP. Using default values.")
+    count_stat("unknown_objects", old_item_type["_name"])
+    return {"effect.name": old_item_type["_name"]}
+
+def make_animation_converter(anim_converters):
+    """Builds the converter of アニメーション効果 / カスタムオブジェクト filters."""
+    def convert(old_item_item, old_item_config, old_item_type, context):
+        anim_name = old_item_item.get("name") if old_item_item.get("name") else "震える"
+        convert_anim = anim_converters.get(anim_name)
+        if convert_anim is None:
+            print(f"Warning: Animation effect '{anim_name}' not found in animation scripts. Skip this item.")
+            count_stat("unresolved_animation_effects", anim_name)
+            return None
+        return convert_anim(old_item_item)
+    return convert
+
+def make_animation_script_converter(anim_name, conv_map):
+    def convert(old_item_item):
+        item_item = overwrite_value(old_item_item, conv_map)
+        item_item["effect.name"] = anim_name
+        return item_item
+    return convert
+
+def convert_standard_draw(old_item_item, old_item_config, old_item_type, context):
+    defaults = VIDEO_DRAW_DEFAULTS if old_item_type["_name"] == "動画ファイル" else STANDARD_DRAW_DEFAULTS
+    return {**defaults, **overwrite_value(old_item_item, PARAM_MAP["標準描画"])}
+
+def convert_standard_play(old_item_item, old_item_config, old_item_type, context):
+    item_view = {**AUDIO_PLAY_DEFAULTS, **overwrite_value(old_item_item, PARAM_MAP["音声ファイル"])}
+    item_view["effect.name"] = "音声再生"
+    return item_view
+
+def convert_script_control(old_item_item, old_item_config, old_item_type, context):
+    item_item = {}
+    item_item["effect.name"] = "スクリプト制御"
+    item_item["テキスト"] = decode_exo_text(old_item_item.get("text", ""))
+    return item_item
+
+def make_effect_conf_converter(effect_name, conv_map):
+    """Builds the converter of an effect from its [OldScript.*] section of effect.conf.
+
+    conv_map is None for effects missing from effect.conf; they are passed through as they are.
+    """
+    mask_type = effect_name == "マスク"
+    def convert(old_item_item, old_item_config, old_item_type, context):
+        if mask_type:
+            old_item_item = dict(old_item_item)
+            old_item_item["マスクの種類"] = VALUE_MAP["図形の種類"].get(old_item_item.get("type"), VALUE_MAP["図形の種類"]["0"])
+        if conv_map is not None:
+            item_other = overwrite_value(old_item_item, conv_map, no_remove=True)
+        else:
+            item_other = dict(old_item_item)
+            print(f"Warning: Effect '{effect_name}' not found in effect.conf. Using default values.")
+            count_stat("effects_missing_from_effect_conf", effect_name)
+        item_other.pop("_name")
+        item_other["effect.name"] = effect_name
+        return item_other
+    return convert
+
+def compile_effect_converters(effect_map, anim_map, registered=None):
+    """Builds the converter tables for every effect in PARAM_MAP, effect_map and anim_map.
+
+    Key mappings and defaults are resolved here once, so converting a filter is a single
+    lookup in the returned {"objects": {...}, "filters": {...}} tables. registered holds the
+    converters of register_effect_converter to use ({"objects": ..., "filters": ...}), by
+    default those registered so far; the tables keep it so that worker processes build the
+    same tables.
+    """
+    if registered is None:
+        registered = {"objects": dict(OBJECT_CONVERTERS), "filters": dict(FILTER_CONVERTERS)}
+    objects = {}
+    for effect_name, conv_map in PARAM_MAP.items():
+        objects[effect_name] = make_object_converter(effect_name, conv_map, OBJECT_FINISHERS.get(effect_name))
+    for effect_name in ["カスタムオブジェクト", "フレームバッファ"]:
+        objects[effect_name] = make_object_converter("標準描画", PARAM_MAP["標準描画"])
+    objects.update(registered["objects"])
+
+    filters = {}
+    for section_name, conv_map in effect_map.items():
+        if section_name.startswith("OldScript.") and isinstance(conv_map, dict):
+            effect_name = section_name[len("OldScript."):]
+            filters[effect_name] = make_effect_conf_converter(effect_name, conv_map)
+    for old_name, effect_name in EFFECT_RENAME_MAP.items():
+        if effect_name in filters:
+            filters[old_name] = filters[effect_name]
+    anim_converters = {anim_name: make_animation_script_converter(anim_name, conv_map) for anim_name, conv_map in anim_map.items()}
+    filters["アニメーション効果"] = filters["カスタムオブジェクト"] = make_animation_converter(anim_converters)
+    filters["標準描画"] = filters["拡張描画"] = convert_standard_draw
+    filters["標準再生"] = convert_standard_play
+    filters["スクリプト制御"] = convert_script_control
+    filters.update(registered["filters"])
+    return {"objects": objects, "filters": filters, "registered": registered}
+
+def write_scene_header(out, exo_num, input_exo_path, old_hedder, output_aup2_path):
+    """Writes the [project] and [scene.N] sections that start every scene."""
+    exo_name = os.path.basename(str(input_exo_path))
+    print("Converting to AUP2 format...")
+    print("reading hedder...")
+    #make aup2 header
+    prj_hedder = {
+        "file": output_aup2_path,
+        "display.scene": 0,
     }
-    padding = 0
-    output_str = ""
+    write_section(out, prj_hedder, "project")
+
+
+    #read hedder
+    hedder = {
+        "scene": 0,
+        "name": "Root",
+        "video.width": 1280,
+        "video.height": 720,
+        "video.rate": 60,
+        "video.scale": 1,
+        "audio.rate": 44100,
+        "cursor.frame": 0,
+        "display.frame": 0,
+        "display.layer": 1,
+        "display.zoom": 1000000,
+        "display.order": 0,
+        "display.camera": "",
+    }
+    hedder["scene"] = exo_num
+    hedder["name"] = exo_name.rsplit(".")[0]
+    hedder["video.width"] = int(old_hedder["width"])
+    hedder["video.height"] = int(old_hedder["height"])
+    hedder["video.rate"] = int(old_hedder["rate"])
+    hedder["audio.rate"] = int(old_hedder["audio_rate"])
+    write_section(out, hedder, f"scene.{exo_num}")
+
+
+def write_object(out, index, item_config, sections):
+    """Writes an object's [index] section followed by its [index.m] effect sections."""
+    write_section(out, item_config, f"{index}")
+    for m, section in enumerate(sections):
+        write_section(out, section, f"{index}.{m}")
+
+def convert_object(context, exo_num, old_item_config, old_filters):
+    """Converts one .exo object into its .aup2 (item_config, sections)."""
+    item_config = {
+        "layer": 0,
+        "frame": [0, 0],
+        "scene":0
+    }
+    item_config["layer"] = int(old_item_config["layer"]) - 1
+    item_config["frame"] = [int(old_item_config["start"]) - 1, int(old_item_config["end"]) - 1]
+    item_config["scene"] = exo_num
+
+    old_item_type = old_filters[0]
+    count_stat("objects", old_item_type["_name"])
+    convert = context["converters"]["objects"].get(old_item_type["_name"], convert_unknown_object)
+    sections = [convert(old_item_type, old_item_config, old_item_type, context)]
+    filter_converters = context["converters"]["filters"]
+    for m in range(1, len(old_filters)):
+        old_item_item = old_filters[m]
+
+        if "blend" in old_item_item.keys(): # 標準描画とか、または、さいごのもの、の条件のほうが適切
+            old_item_item = old_item_item.replace("blend", VALUE_MAP["合成モード"].get(old_item_item["blend"], "通常")) # get関数でない場合は通常これにするよを指定できるの知らなかった...
+
+        count_stat("filters", old_item_item["_name"])
+        convert = filter_converters.get(old_item_item["_name"])
+        if convert is None:
+            # 入力しだいで増えるので、共有の表には加えない
+            convert = make_effect_conf_converter(EFFECT_RENAME_MAP.get(old_item_item["_name"], old_item_item["_name"]), None)
+        item_item = convert(old_item_item, old_item_config, old_item_type, context)
+        if item_item is None:
+            continue  # Skip this item
+        sections.append(item_item)
+    return item_config, sections
+
+def merge_chain(segments):
+    """Folds the segments of a 中間点 chain into one object with keyframed tracks.
+
+    segments are the converted (item_config, sections) of the chained objects. Returns None
+    when the chain can't be expressed as one object, e.g. when the segments have different
+    effects, a constant changes between segments, or a track is not continuous.
+    """
+    first_config, first_sections = segments[0]
+    frames = [first_config["frame"][0]]
+    for k in range(1, len(segments)):
+        item_config = segments[k][0]
+        if item_config["layer"] != first_config["layer"] or item_config["frame"][0] != segments[k - 1][0]["frame"][1] + 1:
+            return None
+        frames.append(item_config["frame"][0])
+    frames.append(segments[-1][0]["frame"][1])
+
+    merged_sections = []
+    for m, first_section in enumerate(first_sections):
+        # セクションごとに各キーの値を縦に並べてからまとめて結合する
+        columns = {key: [value] for key, value in first_section.items()}
+        for _, sections in segments[1:]:
+            if len(sections) != len(first_sections) or sections[m].keys() != first_section.keys():
+                return None
+            for key, value in sections[m].items():
+                columns[key].append(value)
+        merged_section = {}
+        for key, values in columns.items():
+            # 同じトラックが続いても、つながっていなければまとめられないので定数だけ省く
+            constant = not isinstance(values[0], str) or ',' not in values[0]
+            if constant and values.count(values[0]) == len(values):
+                merged_section[key] = values[0]
+                continue
+            merged = merge_track_values(values)
+            if merged is None:
+                return None
+            merged_section[key] = merged
+        merged_sections.append(merged_section)
+
+    merged_config = dict(first_config)
+    merged_config["frame"] = frames
+    return merged_config, merged_sections
+
+def merge_track_values(values):
+    """Joins the "start,end,method,0|params" tracks of consecutive segments into one keyframed track.
+
+    Returns None unless every value is a track as parse_easing_nums writes it, every segment
+    uses the same movement and starts where the previous one ended. Values that effect.conf
+    converters pass through are still in the exo form and are never joined.
+    """
+    keyframes = []
+    movement = None
+    for value in values:
+        if not isinstance(value, str):
+            return None
+        parts = value.split(',', 2)
+        if len(parts) < 3 or not parts[2].split(',', 1)[-1].startswith('0|'):
+            return None
+        if movement is not None and (parts[2] != movement or parts[0] != keyframes[-1]):
+            return None
+        if movement is None:
+            keyframes.append(parts[0])
+            movement = parts[2]
+        keyframes.append(parts[1])
+    return f"{','.join(keyframes)},{movement}"
+
+def convert_scene_objects(context, exo_num, input_exo_path):
+    """Yields the converted (item_config, sections) of every object of a scene .exo.
+
+    With context["merge_chains"], chained 中間点 objects come out as one keyframed object.
+    """
+    print("reading items...")
+    merge_chains = context.get("merge_chains")
+    chain = []
+    for old_item_config, old_filters in stats_iter(iter_exo_objects(input_exo_path), "parse_seconds"):
+        converted = convert_object(context, exo_num, old_item_config, old_filters)
+        if not merge_chains:
+            yield converted
+            continue
+        if chain and old_item_config.get("chain") == "1":
+            chain.append(converted)
+            continue
+        if chain:
+            yield from flush_chain(chain)
+        chain = [converted]
+    if chain:
+        yield from flush_chain(chain)
+
+def flush_chain(chain):
+    merged = merge_chain(chain) if len(chain) > 1 else None
+    return [merged] if merged else chain
+
+def convert_scene(out, context, exo_num, input_exo_path, old_hedder, output_aup2_path, padding):
+    """Converts one scene .exo and writes its sections to out, yielding after every object.
+    Returns the number of objects.
+
+    context holds the compiled converters, video_fps, scene_hedders and the default_scene
+    carried over between scenes.
+    """
+    with stats_scene(input_exo_path) as scene_stats:
+        write_scene_header(out, exo_num, input_exo_path, old_hedder, output_aup2_path)
+        i = 0
+        for item_config, sections in stats_iter(convert_scene_objects(context, exo_num, input_exo_path), "convert_seconds"):
+            write_object(out, i + padding, item_config, sections)
+            i += 1
+            yield
+        if scene_stats:
+            scene_stats["objects"] = i
+    return i
+
+# ワーカープロセスごとに一度だけ受け取るマップなど
+WORKER_STATE = {}
+
+def registered_converters(converters=None):
+    """The registered converters the tables converters were compiled with (by default those
+    registered so far), for the state of init_worker.
+
+    Workers started with spawn (the default on Windows) do not inherit them, so they are passed
+    along, which needs them to be picklable, i.e. module-level functions.
+    """
+    if converters is not None:
+        registered = converters["registered"]
+    else:
+        registered = {"objects": dict(OBJECT_CONVERTERS), "filters": dict(FILTER_CONVERTERS)}
+    try:
+        pickle.dumps(registered)
+    except Exception as e:
+        raise ValueError(f"registered converters must be module-level functions to convert on worker processes: {e}") from e
+    return {"registered": registered}
+
+def init_worker(state):
+    WORKER_STATE.update(state)
+    WORKER_STATE["converters"] = compile_effect_converters(state["effect_map"], state["anim_map"], state.get("registered"))
+
+def scan_exo_scene(exo_path):
+    """Lists the scene= of the シーン objects of a scene .exo in order, None where it is missing.
+
+    Those objects use the scene carried over from the last scene= before them, so this is all
+    a scene passes on to the next one besides its object count.
+    """
+    scene_refs = []
+    in_scene_object = False
+    try:
+        for block in iter_exo_blocks(exo_path):
+            for match in EXO_SCENE_LINE_RE.finditer(b'\n' + block):
+                section_name, key, value = match.groups()
+                if section_name is not None:
+                    section_name = section_name.strip()
+                    head, _, sub = section_name[:-1].partition(b'.')
+                    in_scene_object = section_name.endswith(b']') and head.isdigit() and sub == b"0"
+                elif in_scene_object and key == b'_name':
+                    in_scene_object = value.decode('shift_jis').strip() == "シーン"
+                    if in_scene_object:
+                        scene_refs.append(None)
+                elif in_scene_object and key == b'scene':
+                    scene_refs[-1] = int(value)
+    except (OSError, UnicodeDecodeError):
+        pass
+    return scene_refs
+
+def last_scene_ref(scene_refs, default_scene):
+    for scene in reversed(scene_refs):
+        if scene is not None:
+            return scene
+    return default_scene
+
+def plan_scenes(input_exo_paths, exo_hedders, skip_unreachable=False, dedupe=False, default_scene=1):
+    """Works out which scenes to convert and which scene number each one gets.
+
+    The reference graph comes from the シーン objects of every scene, with the carried over
+    default scene resolved the same way the conversion does. Unreachable scenes (from the root
+    scene) are dropped with skip_unreachable, and with dedupe a scene whose file is identical to
+    an earlier one is dropped and its references point to the earlier scene instead.
+    Returns (scene_numbers, scene_remap, incoming): the output scene number of each scene to
+    convert by exo index, the new number of every scene by old number, and the default scene
+    each scene starts with.
+    """
+    scene_count = len(input_exo_paths)
+    raw_refs = [scan_exo_scene(path) if hedder else [] for path, hedder in zip(input_exo_paths, exo_hedders)]
+    refs = []
+    incoming = []
+    for scene_refs in raw_refs:
+        incoming.append(default_scene)
+        resolved = []
+        for scene in scene_refs:
+            if scene is not None:
+                default_scene = scene
+            resolved.append(default_scene)
+        refs.append(resolved)
+
+    canonical = list(range(scene_count))
+    if dedupe:
+        first_seen = {}
+        for exo_num in range(scene_count):
+            if not exo_hedders[exo_num]:
+                continue
+            with open_exo(input_exo_paths[exo_num], binary=True) as f:
+                key = hashlib.sha1(f.read()).digest()
+            # 引き継いだシーンを使うオブジェクトがあると、同じ内容でも変換結果が変わる
+            if None in raw_refs[exo_num]:
+                key = (key, incoming[exo_num])
+            canonical[exo_num] = first_seen.setdefault(key, exo_num)
+            if canonical[exo_num] != exo_num:
+                print(f"Scene {exo_num} ({input_exo_paths[exo_num]}) is identical to scene {canonical[exo_num]}; converting it once.")
+
+    reachable = set(range(scene_count))
+    if skip_unreachable:
+        reachable = set()
+        pending = [0]
+        while pending:
+            exo_num = canonical[pending.pop()]
+            if exo_num in reachable:
+                continue
+            reachable.add(exo_num)
+            pending.extend(scene for scene in refs[exo_num] if 0 <= scene < scene_count)
+        for exo_num in range(scene_count):
+            if canonical[exo_num] == exo_num and exo_num not in reachable and exo_hedders[exo_num]:
+                print(f"Skipping scene {exo_num} ({input_exo_paths[exo_num]}): not referenced from the root scene.")
 
-    Default_Scene = 1
+    scene_numbers = {}
+    for exo_num in range(scene_count):
+        if canonical[exo_num] == exo_num and exo_num in reachable and exo_hedders[exo_num]:
+            scene_numbers[exo_num] = len(scene_numbers)
+    scene_remap = {exo_num: scene_numbers[canonical[exo_num]]
+                   for exo_num in range(scene_count) if canonical[exo_num] in scene_numbers}
+    return scene_numbers, scene_remap, incoming
 
-    scene_hedders = []
-    parsed_datas = []
+def section_tail(json_data):
+    """Formats a section without its [name] line, for fragments numbered later."""
+    return json_to_exo(json_data, "")[2:].replace("〜", "～")
+
+def build_scene_fragment(context, scene_num, input_exo_path, old_hedder, output_aup2_path):
+    """Converts one scene without writing it.
+
+    Returns (header text, objects, console output). The objects are formatted without their
+    [index] lines, since the index offset of the scene is only known once the earlier scenes
+    are done.
+    """
+    header = io.StringIO()
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log), stats_scene(input_exo_path, "scene_format") as scene_stats:
+        write_scene_header(header, scene_num, input_exo_path, old_hedder, output_aup2_path)
+        converted = stats_iter(convert_scene_objects(context, scene_num, input_exo_path), "convert_seconds")
+        objects = [(section_tail(item_config), [section_tail(section) for section in sections])
+                   for item_config, sections in converted]
+        if scene_stats:
+            scene_stats["objects"] = len(objects)
+    return header.getvalue(), objects, log.getvalue()
+
+def convert_scene_fragment(task):
+    """Converts one scene in a worker process. Returns the fragment (see build_scene_fragment)
+    and the stats of the scene if they are being collected.
+    """
+    exo_num, scene_num, input_exo_path, old_hedder, default_scene = task
+    context = {
+        "effect_map": WORKER_STATE["effect_map"],
+        "anim_map": WORKER_STATE["anim_map"],
+        "converters": WORKER_STATE["converters"],
+        "video_fps": WORKER_STATE["video_fps"],
+        "scene_hedders": WORKER_STATE["scene_hedders"],
+        "default_scene": default_scene,
+        "merge_chains": WORKER_STATE["merge_chains"],
+        "scene_remap": WORKER_STATE["scene_remap"],
+    }
+    if WORKER_STATE.get("stats"):
+        start_stats()
+    fragment = build_scene_fragment(context, scene_num, input_exo_path, old_hedder, WORKER_STATE["output_aup2_path"])
+    return fragment, worker_stats() if STATS else None
+
+def map_version(effect_map, anim_map):
+    """Hash of the effect and animation maps, so cached fragments follow changes to the scripts."""
+    return hashlib.sha1(pickle.dumps((MAP_CACHE_VERSION, effect_map, anim_map))).hexdigest()
+
+def scene_fragment_key(context, task, output_aup2_path):
+    """Cache key of a scene fragment: the .exo content and everything else its conversion reads.
+
+    The index offset of the scene is not part of it, since fragments are numbered as they are
+    written.
+    """
+    exo_num, scene_num, input_exo_path, old_hedder, default_scene = task
+    with open_exo(input_exo_path, binary=True) as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    settings = (
+        context["map_version"], scene_num, default_scene, output_aup2_path, context.get("merge_chains", False),
+        sorted((context.get("scene_remap") or {}).items()), context["scene_hedders"],
+        sorted(context["video_fps"].items()),
+    )
+    return digest + hashlib.sha1(repr(settings).encode('utf-8')).hexdigest()
+
+def convert_scene_fragments(out, context, input_exo_paths, exo_hedders, output_aup2_path, jobs=1, fragment_cache=None):
+    """Converts the scenes one fragment at a time and writes them to out in order.
+
+    The incoming default scene of every scene comes from scan_exo_scene and the objects are
+    numbered as they are written, so the output is the same as converting the scenes one
+    after another. With jobs > 1 the scenes are converted on a process pool. fragment_cache
+    (see load_fragment_cache) keeps the fragment of every scene, and a scene whose key is
+    unchanged is not converted again. Yields after every object written, like convert_scene.
+    """
+    scene_plan = context.get("scene_plan")
+    tasks = []
+    if scene_plan:
+        scene_numbers, incoming = scene_plan
+        for exo_num, scene_num in scene_numbers.items():
+            tasks.append((exo_num, scene_num, input_exo_paths[exo_num], exo_hedders[exo_num], incoming[exo_num]))
+    else:
+        default_scene = context["default_scene"]
+        for exo_num, input_exo_path in enumerate(input_exo_paths):
+            if exo_hedders[exo_num]:
+                tasks.append((exo_num, exo_num, input_exo_path, exo_hedders[exo_num], default_scene))
+                default_scene = last_scene_ref(cached_parse(fragment_cache, input_exo_path, scan_exo_scene), default_scene)
+        context["default_scene"] = default_scene
+
+    cached = {}
+    keys = {}
+    if fragment_cache is not None:
+        for task in tasks:
+            keys[task[0]] = scene_fragment_key(context, task, output_aup2_path)
+            entry = fragment_cache["scenes"].get(os.path.abspath(task[2]))
+            if entry and entry[0] == keys[task[0]]:
+                cached[task[0]] = entry[1]
+            count_stat("cache.fragments", "hits" if task[0] in cached else "misses")
+    misses = [task for task in tasks if task[0] not in cached]
+
+    with contextlib.ExitStack() as stack:
+        if jobs > 1 and misses:
+            state = {
+                "effect_map": context["effect_map"],
+                "anim_map": context["anim_map"],
+                "video_fps": context["video_fps"],
+                "scene_hedders": context["scene_hedders"],
+                "output_aup2_path": output_aup2_path,
+                "merge_chains": context.get("merge_chains", False),
+                "scene_remap": context.get("scene_remap"),
+                "stats": bool(STATS),
+                **registered_converters(context["converters"]),
+            }
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(state,)))
+            converted = executor.map(convert_scene_fragment, misses)
+        else:
+            converted = ((build_scene_fragment(dict(context, default_scene=task[4]), task[1], task[2], task[3], output_aup2_path), None)
+                         for task in misses)
+
+        padding = 0
+        for exo_num in range(len(input_exo_paths)):
+            input_exo_path = input_exo_paths[exo_num]
+            if scene_plan and exo_hedders[exo_num] and exo_num not in scene_plan[0]:
+                continue
+            if not exo_hedders[exo_num]:
+                print(f"Parsing EXO file ({input_exo_path})...")
+                print(f"Error: Failed to parse EXO file {input_exo_path}. Skipping this file.")
+                continue
+            if exo_num in cached:
+                print(f"Reusing converted scene ({input_exo_path})...")
+                header, objects, log = cached[exo_num]
+            else:
+                print(f"Parsing EXO file ({input_exo_path})...")
+                (header, objects, log), scene_stats = next(converted)
+                merge_worker_stats(scene_stats)
+                if fragment_cache is not None:
+                    fragment_cache["scenes"][os.path.abspath(input_exo_path)] = (keys[exo_num], (header, objects, log))
+                    fragment_cache["dirty"] = True
+            print(log, end="")
+            with stats_phase("output_write"):
+                out.write(header)
+                for i, (config_tail, section_tails) in enumerate(objects):
+                    out.write(f"[{i + padding}]{config_tail}\n")
+                    for m, tail in enumerate(section_tails):
+                        out.write(f"[{i + padding}.{m}]{tail}\n")
+                    yield
+            padding = len(objects) + padding
+            print(f"Successfully parsed {len(objects)} items.")
+
+def write_project(out, context, input_exo_paths, output_aup2_path, scene_jobs=1, skip_unreachable=False,
+                  dedupe_scenes=False, fragment_cache=None):
+    """Converts the scenes and writes the .aup2 to out, yielding after every object written.
+
+    A generator so that convert can hand the text out in chunks; exhaust it to write everything.
+    """
+    exo_hedders = []
     # for ONLY 再生位置 in scene obj
     print("Parsing scene header...")
-    for i in range(len(input_exo_paths)):
-        parsed_data = parse_exo(input_exo_paths[i])
-        if parsed_data and "exedit" in parsed_data:
-            parsed_datas.append(parsed_data)
-            scene_hedders.append(parsed_data["exedit"])
+    with stats_phase("header_pass"):
+        for i in range(len(input_exo_paths)):
+            exo_hedder = read_exo_header(input_exo_paths[i])
+            exo_hedders.append(exo_hedder)
+            if exo_hedder:
+                context["scene_hedders"].append(exo_hedder)
+
+    if skip_unreachable or dedupe_scenes:
+        print("Analyzing scene references...")
+        with stats_phase("scene_plan"):
+            scene_numbers, scene_remap, incoming = plan_scenes(input_exo_paths, exo_hedders, skip_unreachable,
+                                                               dedupe_scenes, context["default_scene"])
+        context["scene_plan"] = (scene_numbers, incoming)
+        context["scene_remap"] = scene_remap
 
+    if scene_jobs > 1 or fragment_cache is not None:
+        # ワーカーに渡す前に fps がすべて揃っている必要がある
+        resolve_media_fps(context["video_fps"])
+        if fragment_cache is not None:
+            context["map_version"] = map_version(context["effect_map"], context["anim_map"])
+        yield from convert_scene_fragments(out, context, input_exo_paths, exo_hedders, output_aup2_path, scene_jobs,
+                                           fragment_cache)
+        return
+
+    if context.get("pipeline"):
+        # 変換するシーンを、変換しているあいだに別スレッドで順に読んでおく
+        converted = [exo_num for exo_num, old_hedder in enumerate(exo_hedders)
+                     if old_hedder and (not context["scene_plan"] or exo_num in context["scene_plan"][0])]
+        input_exo_paths = list(input_exo_paths)
+        for exo_num, source in zip(converted, read_ahead([input_exo_paths[exo_num] for exo_num in converted])):
+            input_exo_paths[exo_num] = source
+
+    padding = 0
     for exo_num in range(len(input_exo_paths)):
         input_exo_path = input_exo_paths[exo_num]
-        exo_name = os.path.basename(input_exo_path)
-        print(f"Parsing EXO file ({input_exo_path}) to dict...")
-        parsed_data = parsed_datas[exo_num]
-
-        if parsed_data:
-            print(f"Successfully parsed")
-            #pprint.pprint(parsed_data)
-
-            print("Converting to AUP2 format...")
-            print("reading hedder...")
-            #make aup2 header
-            prj_hedder = {
-                "file": output_aup2_path,
-                "display.scene": 0,
-            }
-            output_str += json_to_exo(prj_hedder, "project") + "\n"
-
-
-            #read hedder
-            hedder = {
-                "scene": 0,
-                "name": "Root",
-                "video.width": 1280,
-                "video.height": 720,
-                "video.rate": 60,
-                "video.scale": 1,
-                "audio.rate": 44100,
-                "cursor.frame": 0,
-                "display.frame": 0,
-                "display.layer": 1,
-                "display.zoom": 1000000,
-                "display.order": 0,
-                "display.camera": "",
-            }
-            old_hedder = parsed_data["exedit"]
-            hedder["scene"] = exo_num
-            hedder["name"] = exo_name.rsplit(".")[0]
-            hedder["video.width"] = int(old_hedder["width"])
-            hedder["video.height"] = int(old_hedder["height"])
-            hedder["video.rate"] = int(old_hedder["rate"])
-            hedder["audio.rate"] = int(old_hedder["audio_rate"])
-            output_str += json_to_exo(hedder, f"scene.{exo_num}") + "\n"
-
-            print("reading items...")
-            i = 0
-            while str(i) in parsed_data:
-                item_config = {
-                    "layer": 0,
-                    "frame": [0, 0],
-                    "scene":0
-                }
-                old_item_config = parsed_data[str(i)]
-                item_config["layer"] = int(old_item_config["layer"]) - 1
-                item_config["frame"] = [int(old_item_config["start"]) - 1, int(old_item_config["end"]) - 1]
-                item_config["scene"] = exo_num
-                output_str += json_to_exo(item_config, f"{i + padding}") + "\n"
-
-                m = 0
-                item_type = {}
-                old_item_type = parsed_data[f"{i}.{m}"]
-                effect_name = old_item_type["_name"]
-                if effect_name in ["カスタムオブジェクト", "フレームバッファ"]:
-                    effect_name = "標準描画"
-                if effect_name in PARAM_MAP:
-                    item_type = overwrite_value(old_item_type, PARAM_MAP[effect_name])
-                else:
-                    print(f"Warning: Effect '{effect_name}' not found in PARAM_MAP. Using default values.")
-
-                if old_item_type["_name"] == "図形":
-                    item_type["角を丸くする"] = "0"
-                    item_type["図形の種類"] = VALUE_MAP["図形の種類"][old_item_type["type"]] if old_item_type.get("type") else VALUE_MAP["図形の種類"]["0"]
-                
-                elif old_item_type["_name"] == "テキスト":
-                    item_type["テキスト"] = decode_exo_text(old_item_type.get("text", ""))
-                elif old_item_type["_name"] in ["音声ファイル", "動画ファイル"]:
-                    if "再生位置" in item_type.keys():
-                        item_type.pop("再生位置")
-
-                    file_path = old_item_type.get("file")
-                    if file_path and file_path not in video_fps:
-                        abs_file_path = os.path.abspath(file_path)
-                        fps_value = 30
-                        try:
-                            cap = cv2.VideoCapture(abs_file_path)
-                            if cap.isOpened():
-                                fps_value = cap.get(cv2.CAP_PROP_FPS)
-                                if not fps_value or fps_value <= 1:
-                                    fps_value = 30
-                            cap.release()
-                        except Exception:
-                            fps_value = 30
-                            print(f"Warning: Could not read FPS from video file '{abs_file_path}'. Using default value 30.")
-                        video_fps[file_path] = fps_value
-
-                    fps = video_fps.get(file_path, 30)
-                    start = float(old_item_config.get("start", 0)) / fps
-                    end = float(old_item_config.get("end", 0)) / fps
-                    speed = float(old_item_type.get("再生速度", 1)) / 100
-                    long = (end - start) * speed
-                    video_start = float(old_item_type["再生位置"]) / fps
-                    item_type["再生位置"] = f"{video_start},{video_start + long},再生範囲,0"
-
-                elif old_item_type["_name"] == "シーン":
-                    if "scene" in old_item_type.keys():
-                        Default_Scene = int(old_item_type["scene"])
-                    else:
-                        item_type["シーン"] = Default_Scene
-                    
-                    if "再生位置" in old_item_type.keys():
-                        item_type["再生位置"] = (float(old_item_type["再生位置"]) - 1) / float(scene_hedders[int(item_type["シーン"])]["rate"])
-
-                elif old_item_type["_name"] in ["グループ制御", "カメラ制御"]:
-                    item_type["対象レイヤー数"] = old_item_type["range"]
-                    item_type.pop("range")
-                
-
-                item_type["effect.name"] = effect_name
-                output_str += json_to_exo(item_type, f"{i + padding}.{m}") + "\n"
-                skiped = 0
-                while f"{i}.{m + 1}" in parsed_data:
-                    m += 1
-                    old_item_item = parsed_data[f"{i}.{m}"]
-
-                    if "blend" in old_item_item.keys(): # 標準描画とか、または、さいごのもの、の条件のほうが適切
-                        old_item_item["blend"] = VALUE_MAP["合成モード"].get(old_item_item["blend"], "通常") # get関数でない場合は通常これにするよを指定できるの知らなかった...
-
-                    if old_item_item["_name"] in ["アニメーション効果", "カスタムオブジェクト"]:
-                        anim_name = old_item_item.get("name") if old_item_item.get("name") else "震える"
-                        if anim_name in anim_map:
-                            item_item = overwrite_value(old_item_item, anim_map[anim_name])
-                            item_item["effect.name"] = anim_name
-                            output_str += json_to_exo(item_item, f"{i + padding}.{m - skiped}") + "\n"
-                        else:
-                            print(f"Warning: Animation effect '{anim_name}' not found in animation scripts. Skip this item.")
-                            skiped += 1  # Skip this item
-                            #item_item = old_item_item           
-                    
-                    elif old_item_item["_name"] in ["標準描画", "拡張描画"]:
-                        item_view = {
-                            "effect.name" : "標準描画",
-                            "X": 0.00,
-                            "Y": 0.00,
-                            "Z": 0.00,
-                            "中心X": 0.00,
-                            "中心Y": 0.00,
-                            "中心Z": 0.00,
-                            "X軸回転": 0.00,
-                            "Y軸回転": 0.00,
-                            "Z軸回転": 0.00,
-                            "拡大率": 100.000,
-                            "縦横比": 0.000,
-                            "透明度": 0.00,
-                            "合成モード": "通常",
-                        }
-                        if old_item_type["_name"] == "動画ファイル":
-                            old_item_item["音量"] = 0.00
-                            item_view["音量"] = 0.00
-                            item_view["effect.name"] = "映像再生"
-                        item_view = {**item_view, **overwrite_value(old_item_item, PARAM_MAP["標準描画"])}
-                        output_str += json_to_exo(item_view, f"{i + padding}.{m - skiped}") + "\n"
-                        
-                    elif old_item_item["_name"] in ["標準再生"]:
-                        item_view = {
-                            "音量": 100.00,
-                            "左右": 0.00,
-                        }
-                        item_view = {**item_view, **overwrite_value(old_item_item, PARAM_MAP["音声ファイル"])}
-                        item_view["effect.name"] = "音声再生"
-                        output_str += json_to_exo(item_view, f"{i + padding}.{m - skiped}") + "\n"
-                    
-                    elif old_item_item["_name"] == "スクリプト制御":
-                        item_item = {}
-                        item_item["effect.name"] = "スクリプト制御"
-                        item_item["テキスト"] = decode_exo_text(old_item_item.get("text", ""))
-                        output_str += json_to_exo(item_item, f"{i + padding}.{m - skiped}") + "\n"
-                        
-                    else: # effects
-                        if old_item_item["_name"] in EFFECT_RENAME_MAP:
-                            old_item_item["_name"] = EFFECT_RENAME_MAP[old_item_item["_name"]]
-                        if old_item_item["_name"] == "マスク":
-                            old_item_item["マスクの種類"] = VALUE_MAP["図形の種類"].get(old_item_item.get("type"), VALUE_MAP["図形の種類"]["0"])
-                        if f"OldScript.{old_item_item["_name"]}" in effect_map:
-                            item_other = overwrite_value(old_item_item, effect_map[f"OldScript.{old_item_item["_name"]}"], no_remove=True)
-                        else:
-                            item_other = dict(old_item_item)
-                            print(f"Warning: Effect '{old_item_item['_name']}' not found in effect.conf. Using default values.")
-                        item_other["effect.name"] = item_other.pop("_name")
-                        output_str += json_to_exo(item_other, f"{i + padding}.{m - skiped}") + "\n"
-                i += 1 
+        old_hedder = exo_hedders[exo_num]
+        scene_num = exo_num
+        if context["scene_plan"] and old_hedder:
+            scene_numbers, incoming = context["scene_plan"]
+            if exo_num not in scene_numbers:
+                continue
+            scene_num = scene_numbers[exo_num]
+            context["default_scene"] = incoming[exo_num]
+        print(f"Parsing EXO file ({input_exo_path})...")
+
+        if old_hedder:
+            i = yield from convert_scene(out, context, scene_num, input_exo_path, old_hedder, output_aup2_path, padding)
             padding = i + padding  # Update padding for next items
             print(f"Successfully parsed {i} items.")
         else:
             print(f"Error: Failed to parse EXO file {input_exo_path}. Skipping this file.")
             continue
 
+def exo_source(scene, exo_num):
+    """Turns a scene given to convert into a path or a MemoryExo, which the .exo readers take."""
+    if isinstance(scene, (str, os.PathLike)):
+        return scene
+    name = "Root.exo" if exo_num == 0 else f"Scene{exo_num}.exo"
+    if isinstance(scene, (bytes, bytearray, memoryview)):
+        return MemoryExo(name, bytes(scene))
+    if isinstance(getattr(scene, "name", None), str):
+        name = os.path.basename(scene.name)
+    return MemoryExo(name, scene.read())
+
+def load_maps(effect_conf_path=EFFECT_CONF_PATH, script_dir=SCRIPT_DIR, cache=None, anim_names=None):
+    """Loads effect.conf and the animation scripts and compiles the converter tables, for convert.
 
-    # 保存
+    Load them once and pass them to any number of convert calls. anim_names limits the scripts
+    as in parse_all_animation_scripts.
+    """
+    effect_map = cached_parse(cache, effect_conf_path, parse_effect_conf)
+    anim_map = parse_all_animation_scripts(script_dir, cache, anim_names)
+    return {
+        "effect_map": effect_map,
+        "anim_map": anim_map,
+        "converters": compile_effect_converters(effect_map, anim_map),
+    }
+
+def convert(scenes, maps, out=None, video_fps=None, output_name="output.aup2", scene_jobs=1, merge_chains=False,
+            skip_unreachable=False, dedupe_scenes=False, fragment_cache=None, pipeline=False, media_cache=None):
+    """Converts scene .exo files (root scene first) into one .aup2 project.
+
+    scenes are paths, bytes or binary file objects. Scenes given in memory are named after the
+    file object, or Root / Scene<N>. maps come from load_maps. The .aup2 is written to out, a
+    text (UTF-8) or binary file object, or if out is None, returned as an iterator of str chunks.
+    video_fps ({media path: fps}) is probed when not given, and gets the FPS of any media found
+    only during conversion. Its values may also be Futures, as from submit_media_probes.
+    media_cache, a cache from load_map_cache (or just {"media": {}}), keeps the probed FPS
+    between calls; without it the media files are probed on every call.
+    output_name is the file name recorded in the project.
+
+    With scene_jobs > 1 the scenes are converted concurrently on that many processes.
+    merge_chains folds chained 中間点 objects into single keyframed objects.
+    skip_unreachable and dedupe_scenes drop scenes as described in plan_scenes and number
+    the remaining scenes from 0. With fragment_cache (see load_fragment_cache), only the scenes
+    whose input changed since the cached conversion are converted again; it needs path scenes.
+    With pipeline, the scene files are read, the media probed and out written on threads while
+    the scenes are converted, through queues of PIPELINE_DEPTH items. The output is the same.
+    Progress is printed to stdout as on the command line.
+    """
+    sources = [exo_source(scene, exo_num) for exo_num, scene in enumerate(scenes)]
+    if fragment_cache is not None and any(isinstance(source, MemoryExo) for source in sources):
+        raise ValueError("fragment_cache needs the scenes as file paths")
+    options = (video_fps, output_name, scene_jobs, merge_chains, skip_unreachable, dedupe_scenes, fragment_cache,
+               pipeline, media_cache)
+    if out is None:
+        buffer = io.StringIO()
+        return iter_text_chunks(convert_steps(buffer, sources, maps, *options), buffer)
+    if isinstance(out, (io.RawIOBase, io.BufferedIOBase)) or 'b' in getattr(out, 'mode', ''):
+        out = codecs.getwriter('utf-8')(out)
+    if pipeline:
+        buffer = io.StringIO()
+        write_in_thread(out, iter_text_chunks(convert_steps(buffer, sources, maps, *options), buffer))
+        return
+    for _ in convert_steps(out, sources, maps, *options):
+        pass
+
+def convert_steps(out, sources, maps, video_fps, output_name, scene_jobs, merge_chains, skip_unreachable,
+                  dedupe_scenes, fragment_cache, pipeline, media_cache):
+    """The body of convert as a generator (see write_project)."""
+    with ThreadPoolExecutor() as executor:
+        if video_fps is None:
+            _, media_paths = scan_exo_references(sources)
+            if pipeline:
+                # 読み取りを待たずに変換を始め、その動画を使うオブジェクトで初めて待つ
+                video_fps = submit_media_probes(media_paths, executor, media_cache)
+            else:
+                video_fps = probe_all_media_fps(media_paths, media_cache)
+        context = {
+            "effect_map": maps["effect_map"],
+            "anim_map": maps["anim_map"],
+            "converters": maps["converters"],
+            "video_fps": video_fps,
+            "scene_hedders": [],
+            "default_scene": 1,
+            "merge_chains": merge_chains,
+            "scene_plan": None,
+            "scene_remap": None,
+            "pipeline": pipeline,
+        }
+        yield from write_project(out, context, sources, output_name, scene_jobs, skip_unreachable, dedupe_scenes,
+                                 fragment_cache)
+
+def write_in_thread(out, chunks, depth=PIPELINE_DEPTH):
+    """Writes the str chunks to out on a thread, so that producing the next ones does not wait
+    for the write. At most depth chunks are held. An error from out is raised again here.
+    """
+    pending = queue.Queue(depth)
+    errors = []
+
+    def drain():
+        while True:
+            chunk = pending.get()
+            if chunk is None:
+                return
+            if errors:
+                continue  # 書けなくなったら、変換側が止まるまで受け取って捨てる
+            try:
+                out.write(chunk)
+            except BaseException as e:
+                errors.append(e)
+
+    thread = threading.Thread(target=drain, daemon=True)
+    thread.start()
+    try:
+        for chunk in chunks:
+            if errors:
+                break
+            pending.put(chunk)
+    finally:
+        pending.put(None)
+        thread.join()
+    if errors:
+        raise errors[0]
+
+def iter_text_chunks(steps, buffer):
+    """Runs steps, which write to the StringIO buffer, and yields what it holds every STREAM_CHUNK_SIZE characters."""
+    for _ in steps:
+        if buffer.tell() >= STREAM_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def convert_project(input_exo_paths, output_aup2_path, effect_map, anim_map, video_fps, scene_jobs=1, converters=None,
+                    merge_chains=False, skip_unreachable=False, dedupe_scenes=False, fragment_cache=None,
+                    pipeline=False, media_cache=None):
+    """Converts the scene .exo files (root scene first) into the .aup2 file output_aup2_path.
+    If the conversion fails, the file is left as it was.
+
+    converters are the tables from compile_effect_converters, compiled here when not given.
+    See convert for the other arguments.
+    """
+    maps = {
+        "effect_map": effect_map,
+        "anim_map": anim_map,
+        "converters": converters or compile_effect_converters(effect_map, anim_map),
+    }
     abs_output_path = os.path.abspath(output_aup2_path)
-    output_str = output_str.replace("〜", "～")
     print(f"Writing output to {abs_output_path}...")
-    with open(abs_output_path, 'w', encoding='utf-8') as f:
-        f.write(output_str)
-    print("Conversion completed successfully.")
\ No newline at end of file
+    # 変換に失敗したときは前の .aup2 を残すので、書き終えてから置き換える
+    tmp_path = abs_output_path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE) as out:
+            convert(input_exo_paths, maps, out, video_fps, output_aup2_path, scene_jobs, merge_chains,
+                    skip_unreachable, dedupe_scenes, fragment_cache, pipeline, media_cache)
+        os.replace(tmp_path, abs_output_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+def find_batch_projects(batch_path):
+    """Lists the projects of a batch as {"inputs": [...], "output": ...} dicts.
+
+    batch_path is either a JSON manifest holding a list of such dicts, with paths relative to the
+    manifest, or a directory whose subdirectories each hold the .exo files of one project. There
+    the root scene is Root.exo (or else the first file by name) and the project is written next to
+    the subdirectory as <subdirectory>.aup2.
+    """
+    projects = []
+    if os.path.isdir(batch_path):
+        for entry in sorted(os.scandir(batch_path), key=lambda entry: entry.name):
+            if not entry.is_dir():
+                continue
+            exo_paths = sorted(glob.glob(os.path.join(entry.path, '*.exo')))
+            if not exo_paths:
+                continue
+            exo_paths.sort(key=lambda path: os.path.splitext(os.path.basename(path))[0].lower() != "root")
+            projects.append({"inputs": exo_paths, "output": os.path.join(batch_path, entry.name + '.aup2')})
+    else:
+        base_dir = os.path.dirname(batch_path)
+        with open(batch_path, 'r', encoding='utf-8') as f:
+            for project in json.load(f):
+                projects.append({
+                    "inputs": [os.path.join(base_dir, path) for path in project["inputs"]],
+                    "output": os.path.join(base_dir, project["output"]),
+                })
+    return projects
+
+def convert_batch_project(project):
+    """Converts one batch project in a worker process. Failures are returned instead of raised."""
+    result = {"inputs": project["inputs"], "output": project["output"], "ok": False, "error": None}
+    new_media_fps = {}
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            _, media_paths = scan_exo_references(project["inputs"])
+            # 新しく読み取ったFPSだけを new_media_fps に入れて親プロセスのキャッシュに戻す
+            media_cache = {"media": ChainMap(new_media_fps, WORKER_STATE["media_fps"])}
+            video_fps = probe_all_media_fps(media_paths, media_cache)
+            convert_project(project["inputs"], project["output"], WORKER_STATE["effect_map"],
+                            WORKER_STATE["anim_map"], video_fps, converters=WORKER_STATE["converters"],
+                            merge_chains=WORKER_STATE["merge_chains"],
+                            skip_unreachable=WORKER_STATE["skip_unreachable"],
+                            dedupe_scenes=WORKER_STATE["dedupe_scenes"])
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc()
+    result["messages"] = [line for line in log.getvalue().splitlines() if line.startswith(("Warning", "Error"))]
+    result["media_fps"] = new_media_fps
+    return result
+
+def run_batch(batch_path, map_cache=None, jobs=None, report_path=None, merge_chains=False, skip_unreachable=False,
+              dedupe_scenes=False):
+    """Converts every project of a batch on a process pool. Returns the number of failed projects.
+
+    The effect and animation maps are loaded once here and handed to each worker.
+    """
+    projects = find_batch_projects(batch_path)
+    print("Parsing effect / animation scripts...")
+    effect_map = cached_parse(map_cache, EFFECT_CONF_PATH, parse_effect_conf)
+    anim_map = parse_all_animation_scripts(SCRIPT_DIR, map_cache)
+    media_fps = map_cache["media"] if map_cache is not None else {}
+
+    print(f"Converting {len(projects)} projects...")
+    results = []
+    state = {"effect_map": effect_map, "anim_map": anim_map, "media_fps": media_fps, "merge_chains": merge_chains,
+             "skip_unreachable": skip_unreachable, "dedupe_scenes": dedupe_scenes, **registered_converters()}
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(state,)) as executor:
+        for num, result in enumerate(executor.map(convert_batch_project, projects), 1):
+            if map_cache is not None and result["media_fps"]:
+                map_cache["media"].update(result.pop("media_fps"))
+                map_cache["dirty"] = True
+            result.pop("media_fps", None)
+            if result["ok"]:
+                print(f"[{num}/{len(projects)}] OK {result['output']} ({len(result['messages'])} warnings)")
+            else:
+                print(f"[{num}/{len(projects)}] FAILED {result['output']}: {result['error']}")
+            results.append(result)
+    if map_cache is not None:
+        save_map_cache(MAP_CACHE_PATH, map_cache)
+
+    failed = sum(1 for result in results if not result["ok"])
+    print(f"Batch completed: {len(results) - failed} succeeded, {failed} failed.")
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return failed
+
+def find_exo_files(paths):
+    """Lists the .exo files given directly or found under the given directories, in name order."""
+    exo_paths = []
+    for path in paths:
+        if not os.path.isdir(path):
+            exo_paths.append(path)
+            continue
+        for dir_path, dir_names, file_names in os.walk(path):
+            dir_names.sort()
+            exo_paths.extend(os.path.join(dir_path, name) for name in sorted(file_names) if name.lower().endswith('.exo'))
+    return exo_paths
+
+def coverage_tables(effect_map, anim_map):
+    """Describes what conversion does with each effect, for scan_exo_compatibility.
+
+    Maps every object type, filter and animation effect the converter knows to (conv_map,
+    what happens to the parameters missing from it: "dropped" or "kept"). conv_map is None for
+    registered converters, whose parameters can't be checked.
+    """
+    objects = {effect_name: (conv_map, "dropped") for effect_name, conv_map in PARAM_MAP.items()}
+    for effect_name in ["カスタムオブジェクト", "フレームバッファ"]:
+        objects[effect_name] = (PARAM_MAP["標準描画"], "dropped")
+    objects.update((effect_name, (None, None)) for effect_name in OBJECT_CONVERTERS)
+
+    filters = {}
+    for section_name, conv_map in effect_map.items():
+        if section_name.startswith("OldScript.") and isinstance(conv_map, dict):
+            filters[section_name[len("OldScript."):]] = (conv_map, "kept")
+    for old_name, effect_name in EFFECT_RENAME_MAP.items():
+        if effect_name in filters:
+            filters[old_name] = filters[effect_name]
+    filters["アニメーション効果"] = filters["カスタムオブジェクト"] = ({}, "dropped")
+    filters["標準描画"] = filters["拡張描画"] = (PARAM_MAP["標準描画"], "dropped")
+    filters["標準再生"] = (PARAM_MAP["音声ファイル"], "dropped")
+    filters["スクリプト制御"] = ({"text": "テキスト"}, "dropped")
+    filters.update((effect_name, (None, None)) for effect_name in FILTER_CONVERTERS)
+
+    animations = {anim_name: (conv_map, "dropped") for anim_name, conv_map in anim_map.items()}
+    return {"object": objects, "filter": filters, "animation": animations}
+
+def scan_exo_compatibility(exo_path):
+    """Counts the effects and parameters of one .exo against WORKER_STATE["coverage"], without converting it.
+
+    Returns {"effects": {(kind, name, status): count}, "parameters": {(kind, name, param, status): count}}
+    with an "error" instead when the file can't be read. status is "supported", "custom", or the
+    message conversion would print: "unknown_object", "unresolved_animation" or
+    "missing_from_effect_conf". Parameters are "mapped", "dropped" or "kept" as they are.
+    """
+    tables = WORKER_STATE["coverage"]
+    effects = {}
+    parameters = {}
+
+    def count(kind, name, section, status, ignored=()):
+        effects[kind, name, status] = effects.get((kind, name, status), 0) + 1
+        if status == "custom" or ignored is None:
+            return
+        # effect.conf にない効果はそのまま残り、ほかの未対応のものは捨てられる
+        conv_map, unmapped = tables[kind].get(name, (None, "kept" if status == "missing_from_effect_conf" else "dropped"))
+        for key in section:
+            if key == "_name" or key in ignored:
+                continue
+            param_status = "mapped" if conv_map is not None and key in conv_map else unmapped
+            parameters[kind, name, key, param_status] = parameters.get((kind, name, key, param_status), 0) + 1
+
+    try:
+        for _, old_filters in iter_exo_objects(exo_path):
+            old_item_type = old_filters[0]
+            name = old_item_type.get("_name", "")
+            entry = tables["object"].get(name)
+            status = "unknown_object" if entry is None else "custom" if entry[0] is None else "supported"
+            count("object", name, old_item_type, status, FINISHER_KEYS.get(name, ()))
+            for old_item_item in old_filters[1:]:
+                name = old_item_item.get("_name", "")
+                entry = tables["filter"].get(name)
+                status = "missing_from_effect_conf" if entry is None else "custom" if entry[0] is None else "supported"
+                is_animation = name in ["アニメーション効果", "カスタムオブジェクト"] and status == "supported"
+                # アニメーション効果のパラメータは効果ごとに animation として数える
+                count("filter", name, old_item_item, status, None if is_animation else ())
+                if is_animation:
+                    anim_name = old_item_item.get("name") or "震える"
+                    status = "supported" if anim_name in tables["animation"] else "unresolved_animation"
+                    count("animation", anim_name, old_item_item, status, ("name",))
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    return {"effects": effects, "parameters": parameters}
+
+def run_scan(paths, map_cache=None, jobs=None, report_path=None):
+    """Checks which effects and parameters of many .exo files the converter supports.
+
+    The files are read on a process pool without converting them, writing anything or probing
+    media, and the counts are added up into one report, which is printed and, with report_path,
+    written as JSON. Returns the report.
+    """
+    exo_paths = find_exo_files(paths)
+    print("Parsing effect / animation scripts...")
+    effect_map = cached_parse(map_cache, EFFECT_CONF_PATH, parse_effect_conf)
+    anim_map = parse_all_animation_scripts(SCRIPT_DIR, map_cache)
+    if map_cache is not None:
+        save_map_cache(MAP_CACHE_PATH, map_cache)
+
+    print(f"Scanning {len(exo_paths)} files...")
+    started = time.perf_counter()
+    effects = {}
+    failed = []
+    state = {"effect_map": effect_map, "anim_map": anim_map, "coverage": coverage_tables(effect_map, anim_map)}
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(state,)) as executor:
+        for exo_path, result in zip(exo_paths, executor.map(scan_exo_compatibility, exo_paths, chunksize=16)):
+            if "error" in result:
+                failed.append({"path": exo_path, "error": result["error"]})
+                continue
+            for (kind, name, status), count in result["effects"].items():
+                effect = effects.setdefault((kind, name), {"kind": kind, "name": name, "status": status, "count": 0,
+                                                           "files": 0, "parameters": {}})
+                effect["count"] += count
+                effect["files"] += 1
+            for (kind, name, key, status), count in result["parameters"].items():
+                parameter = effects[kind, name]["parameters"].setdefault(key, {"status": status, "count": 0})
+                parameter["count"] += count
+
+    summary = {status: {} for status in ["unknown_object", "unresolved_animation", "missing_from_effect_conf"]}
+    summary["dropped_parameters"] = {}
+    for effect in effects.values():
+        if effect["status"] in summary:
+            summary[effect["status"]][effect["name"]] = effect["count"]
+        for key, parameter in effect["parameters"].items():
+            if parameter["status"] == "dropped":
+                summary["dropped_parameters"][f"{effect['name']}/{key}"] = parameter["count"]
+    report = {
+        "files": len(exo_paths),
+        "failed": failed,
+        "objects": sum(effect["count"] for effect in effects.values() if effect["kind"] == "object"),
+        "filters": sum(effect["count"] for effect in effects.values() if effect["kind"] == "filter"),
+        "summary": {status: dict(sorted(names.items(), key=lambda item: -item[1])) for status, names in summary.items()},
+        "effects": [effects[key] for key in sorted(effects)],
+    }
+
+    print(f"Scanned {report['files']} files ({report['objects']} objects, {report['filters']} filters) "
+          f"in {time.perf_counter() - started:.2f}s.")
+    for entry in failed:
+        print(f"Error: {entry['path']}: {entry['error']}")
+    titles = {
+        "unknown_object": "Effects not found in PARAM_MAP",
+        "unresolved_animation": "Animation effects not found in animation scripts",
+        "missing_from_effect_conf": "Effects not found in effect.conf",
+        "dropped_parameters": "Parameters dropped in conversion",
+    }
+    for status, title in titles.items():
+        names = report["summary"][status]
+        print(f"{title}: {len(names)}")
+        for name, count in list(names.items())[:SCAN_PRINT_LIMIT]:
+            print(f"  {name}: {count}")
+        if len(names) > SCAN_PRINT_LIMIT:
+            print(f"  ... and {len(names) - SCAN_PRINT_LIMIT} more")
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+def file_signature(file_path):
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+def watch_project(input_exo_paths, output_aup2_path, map_cache=None, scene_jobs=1, **options):
+    """Converts the project again whenever one of its .exo files changes, until interrupted.
+
+    The maps stay loaded and the converted scenes are kept, so only the scenes that changed are
+    converted again. The other keyword arguments are passed on to convert_project.
+    """
+    persist = map_cache is not None
+    if not persist:
+        map_cache = {"files": {}, "media": {}}
+    print("Parsing effect / animation scripts...")
+    # 編集中に新しい効果が使われても変換済みのシーンを使えるよう、すべて読み込んでおく
+    maps = load_maps(cache=map_cache)
+    fragment_cache = load_fragment_cache(FRAGMENT_CACHE_PATH) if persist else {"scenes": {}, "files": {}}
+
+    signatures = None
+    print(f"Watching {len(input_exo_paths)} files. Press Ctrl+C to stop.")
+    try:
+        while True:
+            current = [file_signature(path) for path in input_exo_paths]
+            if current != signatures:
+                signatures = current
+                started = time.perf_counter()
+                try:
+                    _, media_paths = scan_exo_references(input_exo_paths, fragment_cache)
+                    video_fps = probe_all_media_fps(media_paths, map_cache)
+                    convert_project(input_exo_paths, output_aup2_path, maps["effect_map"], maps["anim_map"], video_fps,
+                                    scene_jobs, maps["converters"], fragment_cache=fragment_cache, **options)
+                except Exception as e:
+                    # 保存途中のファイルを読んだ場合など。前の .aup2 は残り、次の保存で変換し直す
+                    print(f"Error: {type(e).__name__}: {e}. Kept the previous {output_aup2_path}.")
+                else:
+                    print(f"Updated {output_aup2_path} in {time.perf_counter() - started:.2f}s.")
+                if persist:
+                    save_map_cache(MAP_CACHE_PATH, map_cache)
+            time.sleep(WATCH_INTERVAL)
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+    finally:
+        if persist:
+            save_fragment_cache(FRAGMENT_CACHE_PATH, fragment_cache)
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(usage="python exo_to_aup2-2.py [options] <Root.exo> <Scene1.exo> <output.aup2>")
+    arg_parser.add_argument("paths", nargs="*", help="input .exo files followed by the output .aup2 file")
+    arg_parser.add_argument("--no-cache", action="store_true", help=f"do not read or write {MAP_CACHE_PATH}")
+    arg_parser.add_argument("--batch", metavar="MANIFEST_OR_DIR", help="convert every project listed in a JSON manifest or found in a directory")
+    arg_parser.add_argument("--scan", action="store_true", help="only check which effects of the given .exo files and directories are supported")
+    arg_parser.add_argument("--jobs", type=int, help="number of worker processes for --batch and --scan (default: number of CPUs)")
+    arg_parser.add_argument("--report", metavar="FILE", help="write the per-project results of --batch or the --scan report as JSON")
+    arg_parser.add_argument("--scene-jobs", type=int, default=1, metavar="N", help="convert the scenes of a project on N worker processes")
+    arg_parser.add_argument("--merge-chains", action="store_true", help="fold chained mid-point (中間点) objects into single keyframed objects")
+    arg_parser.add_argument("--skip-unreachable-scenes", action="store_true", help="do not convert scenes that the root scene never uses")
+    arg_parser.add_argument("--dedupe-scenes", action="store_true", help="convert identical scene files only once")
+    arg_parser.add_argument("--pipeline", action="store_true", help="read, probe media, convert and write concurrently on threads")
+    arg_parser.add_argument("--watch", action="store_true", help="keep running and convert again whenever an input .exo changes")
+    arg_parser.add_argument("--stats", metavar="FILE", help="write phase timings, memory peaks, counters and cache hits as JSON")
+    arg_parser.add_argument("--trace-memory", action="store_true", help="also trace allocations with tracemalloc for --stats (slow)")
+    arg_parser.add_argument("--profile", metavar="FILE", help="run under cProfile and write the pstats data to FILE")
+    args = arg_parser.parse_args()
+    if (args.batch or args.scan) and (args.stats or args.trace_memory or args.profile):
+        # 変換はワーカープロセスで進むので、このプロセスを測っても意味がない
+        arg_parser.error("--stats, --trace-memory and --profile cannot be used with --batch or --scan")
+    if args.stats:
+        start_stats(args.trace_memory)
+    with stats_phase("cache_load"):
+        map_cache = None if args.no_cache else load_map_cache(MAP_CACHE_PATH)
+
+    if args.batch:
+        sys.exit(1 if run_batch(args.batch, map_cache, args.jobs, args.report, args.merge_chains,
+                                   args.skip_unreachable_scenes, args.dedupe_scenes) else 0)
+
+    if args.scan:
+        if not args.paths:
+            print("Usage: python exo_to_aup2-2.py --scan <.exo files or directories>")
+            sys.exit(1)
+        run_scan(args.paths, map_cache, args.jobs, args.report)
+        sys.exit(0)
+
+    if len(args.paths) < 2:
+        print("Usage: python exo_to_aup2-2.py <Root.exo> <Scene1.exo> <output.aup2>")
+        sys.exit(1)
+
+    input_exo_paths = args.paths[:-1]
+    output_aup2_path = args.paths[-1]
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    probe_executor = ThreadPoolExecutor() if args.pipeline else None
+    try:
+        if args.watch:
+            watch_project(input_exo_paths, output_aup2_path, map_cache, args.scene_jobs, merge_chains=args.merge_chains,
+                          skip_unreachable=args.skip_unreachable_scenes, dedupe_scenes=args.dedupe_scenes)
+            sys.exit(0)
+
+        print("Parsing effect / animation scripts...")
+        with stats_phase("reference_scan"):
+            anim_names, media_paths = scan_exo_references(input_exo_paths)
+        if probe_executor:
+            # 動画の読み取りはスクリプトの読み込みや変換と並行して進め、変換で使うときに待つ
+            # 読み取りはほかの処理と重なるので、media_probing の時間には数えない
+            print(f"Probing {len(media_paths)} media files...")
+            video_fps = submit_media_probes(media_paths, probe_executor, map_cache)
+        with stats_phase("map_loading"):
+            maps = load_maps(cache=map_cache, anim_names=anim_names)
+
+        # Cache Video fps
+        # Path:fps
+        if not probe_executor:
+            print(f"Probing {len(media_paths)} media files...")
+            with stats_phase("media_probing"):
+                video_fps = probe_all_media_fps(media_paths, map_cache)
+            if map_cache is not None:
+                with stats_phase("cache_save"):
+                    save_map_cache(MAP_CACHE_PATH, map_cache)
+        convert_project(input_exo_paths, output_aup2_path, maps["effect_map"], maps["anim_map"], video_fps,
+                        args.scene_jobs, maps["converters"], merge_chains=args.merge_chains,
+                        skip_unreachable=args.skip_unreachable_scenes, dedupe_scenes=args.dedupe_scenes,
+                        pipeline=args.pipeline)
+        if probe_executor and map_cache is not None:
+            # 読み取りの結果は変換のあとにまとめて保存する
+            resolve_media_fps(video_fps)
+            with stats_phase("cache_save"):
+                save_map_cache(MAP_CACHE_PATH, map_cache)
+        print("Conversion completed successfully.")
+    finally:
+        if probe_executor:
+            probe_executor.shutdown()
+        # 失敗したときもそこまでの結果を残す
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if STATS:
+            finish_stats(args.stats)